@@ -6,6 +6,7 @@ Designed for Railway deployment as a long-lived process.
 """
 
 import asyncio
+import gc
 import hashlib
 import hmac as hmac_mod
 import json
@@ -104,8 +105,26 @@ def _load_engine_background():
     else:
         logger.info("Geocoder: Census only (no GOOGLE_API_KEY or GOOGLE_MAPS_API_KEY)")
 
+    # Regional deployments: load spatial layers lazily in tiles, preloading these states
+    partition_deg = os.environ.get("SPATIAL_PARTITION_DEG", "")
+    if partition_deg:
+        config.spatial_partition_deg = float(partition_deg)
+        config.spatial_preload_states = [
+            s.strip().upper() for s in os.environ.get("SPATIAL_PRELOAD_STATES", "").split(",") if s.strip()
+        ]
+        logger.info(f"Spatial layers: {config.spatial_partition_deg}° tiles, preloading {config.spatial_preload_states or 'none'}")
+
+    # Warm start: replay this request log (JSONL, one {"address": ...} per line) at boot
+    replay_log = os.environ.get("WARM_REPLAY_LOG", "")
+    if replay_log:
+        config.warm_replay_log = Path(replay_log)
+
     skip_water = os.environ.get("SKIP_WATER", "").lower() in ("1", "true", "yes")
-    engine = LookupEngine(config, skip_water=skip_water)
+    new_engine = LookupEngine(config, skip_water=skip_water)
+    # Prefill caches before publishing the engine, so /health reports ready warm
+    warmed = new_engine.warm_start()
+    logger.info(f"Warm start: {warmed['snapshot']} snapshot entries, {warmed['replayed']} replayed lookups")
+    engine = new_engine
 
     # AI resolver for low-confidence results
     anthropic_key = os.environ.get("ANTHROPIC_API_KEY", "")
@@ -123,20 +142,34 @@ def _load_engine_background():
     logger.info(f"Engine ready in {elapsed:.1f}s")
 
 
+# Multi-worker mode (see gunicorn.conf.py): load the engine once in the master
+# process so forked workers share the spatial layers copy-on-write instead of
+# each loading its own copy. gc.freeze() keeps the collector from touching
+# (and thereby un-sharing) the pages holding those long-lived objects.
+if os.environ.get("PRELOAD_ENGINE", "").lower() in ("1", "true", "yes"):
+    _load_engine_background()
+    engine.before_fork()  # workers run the cache writer/maintenance threads, not the master
+    gc.freeze()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Start engine loading in background, yield immediately so server accepts connections."""
+    """Start engine loading in background (unless preloaded), yield immediately so server accepts connections."""
     global _API_KEYS
     _API_KEYS = _load_api_keys()
 
-    loader = threading.Thread(target=_load_engine_background, daemon=True)
-    loader.start()
+    if engine is None:
+        loader = threading.Thread(target=_load_engine_background, daemon=True)
+        loader.start()
 
     yield
 
     # Shutdown: save caches
     if engine:
         engine.state_gis.save_disk_cache()
+        engine.state_gis.close()
+        engine.save_warm_snapshot()  # hot keys for the next start's warm_start()
+        engine.cache.close()  # flush write-behind queue
     logger.info("Shutdown complete.")
 
 
@@ -226,6 +259,8 @@ class HealthResponse(BaseModel):
     status: str
     engine_loaded: bool
     uptime_seconds: float
+    spatial_cache: Optional[dict] = None
+    lookup_cache: Optional[dict] = None
 
 
 _start_time = time.time()
@@ -313,19 +348,39 @@ async def health():
         status="ok" if engine else "loading",
         engine_loaded=engine is not None,
         uptime_seconds=round(time.time() - _start_time, 1),
+        spatial_cache=engine.spatial.cache.stats if engine else None,
+        lookup_cache=engine.cache.stats if engine else None,
     )
 
 
 @app.delete("/cache", dependencies=[Depends(require_api_key)])
-async def clear_cache():
-    """Clear the lookup cache. Use after deploying fixes to avoid stale results."""
+async def clear_cache(
+    tag: Optional[str] = Query(None, description="Only remove entries with this dependency tag, "
+                                                 "e.g. electric:state_gis_tx or zip:75201"),
+):
+    """
+    Clear the lookup cache. Use after deploying fixes to avoid stale results.
+    With tag, only the entries that depended on that source/ZIP/data version
+    are removed (see GET /cache/tags).
+    """
     if not engine:
         raise HTTPException(status_code=503, detail="Engine is still loading.")
+    if tag:
+        count = engine.cache.invalidate_tag(tag)
+        return {"cleared": count, "tag": tag}
     count = engine.cache.clear()
     logger.info(f"Cache cleared: {count} entries removed")
     return {"cleared": count}
 
 
+@app.get("/cache/tags", dependencies=[Depends(require_api_key)])
+async def cache_tags(prefix: str = Query("", description="Only tags starting with this, e.g. corrections:")):
+    """Cached entries per dependency tag."""
+    if not engine:
+        raise HTTPException(status_code=503, detail="Engine is still loading.")
+    return engine.cache.tag_counts(prefix)
+
+
 @app.get("/lookup", response_model=LookupResponse)
 async def lookup(
     address: str = Query(..., description="Full US address to look up", min_length=5),
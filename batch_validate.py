@@ -30,7 +30,7 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 from lookup_engine.config import Config
 from lookup_engine.engine import LookupEngine
-from lookup_engine.geocoder import CensusGeocoder
+from lookup_engine.geocoder import CachingGeocoder, CensusGeocoder
 from provider_normalizer import (
     is_deregulated_rep,
     normalize_provider,
@@ -899,7 +899,9 @@ def run_batch(args):
         logger.info(f"Geocode disk cache saved: {len(geo_disk_cache)} entries{' (' + label + ')' if label else ''}")
 
     def _cache_geo_result(geo_disk_cache, addr, geo):
-        """Add a single geocode result to the disk cache dict."""
+        """Add a single geocode result to the disk cache dict (and the engine's shared geocode cache)."""
+        if geo and addr and isinstance(engine.geocoder, CachingGeocoder):
+            engine.geocoder.store(addr, geo)
         if geo and addr not in geo_disk_cache:
             geo_disk_cache[addr] = {
                 "lat": geo.lat, "lon": geo.lon,
@@ -983,14 +985,21 @@ def run_batch(args):
         address = row.get("display", "").strip()
         if not address:
             continue
-        # Check engine cache first, then disk geocode cache
+        # Check engine cache first, then disk geocode cache, then the shared geocode cache
         cached = engine.cache.get(address)
         if cached:
             address_coords[address] = "cached"
         elif address in geo_disk_cache:
             address_coords[address] = "geo_cached"
         else:
-            uncached_addresses.append((str(start_idx + i), address))
+            found, geo = engine.geocoder.cached(address) if isinstance(engine.geocoder, CachingGeocoder) else (False, None)
+            if found:
+                # Cached miss: the engine.lookup fallback answers it from the cache too
+                address_coords[address] = "geo_cached"
+                if geo:
+                    _cache_geo_result(geo_disk_cache, address, geo)
+            else:
+                uncached_addresses.append((str(start_idx + i), address))
 
     cached_count = total - len(uncached_addresses)
     logger.info(f"Geocoding: {total} addresses, {cached_count} cached, {len(uncached_addresses)} need geocoding")
@@ -1227,8 +1236,37 @@ def run_batch(args):
     # Process each row — geocoding is already done, just spatial + compare
     times_per_row = []
     google_fallback_addresses = []
-
-    def _do_spatial_lookup(i, row):
+    _types = ("electric", "gas") if args.skip_water else ("electric", "gas", "water")
+
+    def _prefetch_polygons(batch_start, batch_rows):
+        """
+        Bulk spatial query for the geocoded, not-yet-cached rows of a batch.
+        One query_points_all() call (one SQL statement on PostGIS) instead of
+        one query per row. Returns {row_key: {utility_type: polygons}}.
+        """
+        keys, lats, lons = [], [], []
+        for j, row in enumerate(batch_rows):
+            address = row.get("display", "").strip()
+            if not address or address in spatial_cache:
+                continue
+            row_key = str(start_idx + batch_start + j)
+            if address in geo_disk_cache:
+                lat, lon = geo_disk_cache[address]["lat"], geo_disk_cache[address]["lon"]
+                if lat == 0.0 and lon == 0.0:
+                    continue
+            elif batch_geo_results.get(row_key):
+                lat, lon = batch_geo_results[row_key].lat, batch_geo_results[row_key].lon
+            else:
+                continue
+            keys.append(row_key)
+            lats.append(lat)
+            lons.append(lon)
+        if not keys:
+            return {}
+        found = engine.spatial.query_points_all(lats, lons, _types)
+        return {key: {utype: found[utype][n] for utype in _types} for n, key in enumerate(keys)}
+
+    def _do_spatial_lookup(i, row, prefetched=None):
         """Run spatial lookups for a single row. Returns all data needed for comparison."""
         nonlocal spatial_cache_dirty
         row_idx = start_idx + i
@@ -1270,8 +1308,6 @@ def run_batch(args):
         water = None
         sewer = None
 
-        # Note: engine.cache (SQLite) is not thread-safe, so we only use
-        # geo_disk_cache (plain dict) here. It covers 99%+ of addresses.
         if address in geo_disk_cache:
             gc = geo_disk_cache[address]
             lat = gc["lat"]
@@ -1281,9 +1317,10 @@ def run_batch(args):
             addr_county = gc.get("county", "") or addr_county
             _lkw["county"] = addr_county
             if lat != 0.0 or lon != 0.0:
-                electric = engine._lookup_with_state_gis(lat, lon, state, "electric", **_lkw)
-                gas = engine._lookup_with_state_gis(lat, lon, state, "gas", **_lkw)
-                water = engine._lookup_with_state_gis(lat, lon, state, "water", **_lkw) if not args.skip_water else None
+                polygons = (prefetched or {}).get(row_key) or engine.spatial.query_point_all(lat, lon, _types)
+                electric = engine._lookup_with_state_gis(lat, lon, state, "electric", polygons=polygons["electric"], **_lkw)
+                gas = engine._lookup_with_state_gis(lat, lon, state, "gas", polygons=polygons["gas"], **_lkw)
+                water = engine._lookup_with_state_gis(lat, lon, state, "water", polygons=polygons["water"], **_lkw) if not args.skip_water else None
                 sewer = engine._lookup_sewer(lat, lon, state, _lkw.get("zip_code", ""), _lkw.get("city", ""), _lkw.get("county", ""), water)
         else:
             batch_geo = batch_geo_results.get(row_key)
@@ -1292,16 +1329,21 @@ def run_batch(args):
                 lon = batch_geo.lon
                 geocode_conf = batch_geo.confidence
                 block_geoid = getattr(batch_geo, "block_geoid", "") or ""
-                electric = engine._lookup_with_state_gis(lat, lon, state, "electric", **_lkw)
-                gas = engine._lookup_with_state_gis(lat, lon, state, "gas", **_lkw)
-                water = engine._lookup_with_state_gis(lat, lon, state, "water", **_lkw) if not args.skip_water else None
+                polygons = (prefetched or {}).get(row_key) or engine.spatial.query_point_all(lat, lon, _types)
+                electric = engine._lookup_with_state_gis(lat, lon, state, "electric", polygons=polygons["electric"], **_lkw)
+                gas = engine._lookup_with_state_gis(lat, lon, state, "gas", polygons=polygons["gas"], **_lkw)
+                water = engine._lookup_with_state_gis(lat, lon, state, "water", polygons=polygons["water"], **_lkw) if not args.skip_water else None
                 sewer = engine._lookup_sewer(lat, lon, state, _lkw.get("zip_code", ""), _lkw.get("city", ""), _lkw.get("county", ""), water)
             else:
-                # engine.lookup uses SQLite cache (not thread-safe).
-                # Flag for sequential fallback in the main thread.
+                # Full engine lookup (engine.cache is safe to share across threads)
+                result = engine.lookup(address, use_cache=True)
                 return {
                     "i": i, "row": row, "row_idx": row_idx, "address": address,
-                    "skip": False, "needs_engine_lookup": True,
+                    "state": state, "lat": result.lat, "lon": result.lon,
+                    "geocode_conf": result.geocode_confidence, "block_geoid": "",
+                    "electric": result.electric, "gas": result.gas,
+                    "water": result.water, "sewer": result.sewer,
+                    "skip": False,
                 }
 
         # Save to spatial cache
@@ -1333,10 +1375,12 @@ def run_batch(args):
         batch_end = min(batch_start + BATCH_SIZE, total)
         batch_rows = rows_to_process[batch_start:batch_end]
 
-        # Submit all rows in this batch to the thread pool
+        # Polygon lookups for the whole batch in one bulk query, then submit
+        # all rows in this batch to the thread pool
+        prefetched = _prefetch_polygons(batch_start, batch_rows)
         futures = []
         for j, row in enumerate(batch_rows):
-            futures.append(_lookup_pool.submit(_do_spatial_lookup, batch_start + j, row))
+            futures.append(_lookup_pool.submit(_do_spatial_lookup, batch_start + j, row, prefetched))
 
         # Collect results in order and process sequentially
         for future in futures:
@@ -1352,28 +1396,15 @@ def run_batch(args):
 
             address = r["address"]
 
-            # Handle rows that need engine.lookup (SQLite, must run on main thread)
-            if r.get("needs_engine_lookup"):
-                result = engine.lookup(address, use_cache=True)
-                lat = result.lat
-                lon = result.lon
-                geocode_conf = result.geocode_confidence
-                block_geoid = ""
-                electric = result.electric
-                gas = result.gas
-                water = result.water
-                sewer = result.sewer
-                state = _extract_state(address)
-            else:
-                state = r["state"]
-                lat = r["lat"]
-                lon = r["lon"]
-                geocode_conf = r["geocode_conf"]
-                block_geoid = r["block_geoid"]
-                electric = r["electric"]
-                gas = r["gas"]
-                water = r["water"]
-                sewer = r["sewer"]
+            state = r["state"]
+            lat = r["lat"]
+            lon = r["lon"]
+            geocode_conf = r["geocode_conf"]
+            block_geoid = r["block_geoid"]
+            electric = r["electric"]
+            gas = r["gas"]
+            water = r["water"]
+            sewer = r["sewer"]
 
             if lat == 0.0 and lon == 0.0:
                 stats["geocode_fail"] += 1
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark SpatialIndex point-in-polygon latency with and without prepared geometries.
+
+Usage:
+    python benchmark_spatial.py
+    python benchmark_spatial.py --layers electric water --points 5000
+
+Loads the layers the same way the engine does (snapshot if present), samples
+points inside random territories, and times query_point() per point twice:
+once with the geometries as loaded (prepared) and once after
+shapely.destroy_prepared(). Results of both runs are compared for equality.
+The snapshot cell table and the quantized spatial LRU are switched off so
+every query reaches the containment test being measured.
+"""
+
+import argparse
+import logging
+import statistics
+import time
+
+import numpy as np
+import shapely
+
+from lookup_engine.config import Config
+from lookup_engine.spatial_index import SpatialIndex
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def sample_points(geoms, n: int, rng) -> list:
+    """Points on the surface of randomly chosen polygons, jittered ~1 km."""
+    idx = rng.integers(0, len(geoms), n)
+    pts = shapely.point_on_surface(geoms[idx])
+    lons = shapely.get_x(pts) + rng.normal(0, 0.01, n)
+    lats = shapely.get_y(pts) + rng.normal(0, 0.01, n)
+    return list(zip(lats.tolist(), lons.tolist()))
+
+
+def time_queries(spatial: SpatialIndex, points: list, utility_type: str):
+    latencies = []
+    results = []
+    for lat, lon in points:
+        t0 = time.perf_counter()
+        results.append(spatial.query_point(lat, lon, utility_type))
+        latencies.append((time.perf_counter() - t0) * 1e6)
+    return latencies, results
+
+
+def summarize(latencies: list) -> str:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95)]
+    return (f"mean={statistics.fmean(latencies):8.1f}us  "
+            f"p50={statistics.median(latencies):8.1f}us  p95={p95:8.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prepared vs raw geometry containment")
+    parser.add_argument("--layers", nargs="+", default=["electric", "water"],
+                        choices=["electric", "gas", "water"])
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    spatial = SpatialIndex(Config())
+    spatial.load_all()
+    # Both would answer most queries without a geometry test (and the second
+    # run would hit cells the first one proved), so neither run would measure containment
+    spatial.cache.maxsize = 0
+    spatial.cache.clear()
+    rng = np.random.default_rng(args.seed)
+
+    for utility_type in args.layers:
+        layer = spatial._get_layer(utility_type)
+        if layer is None:
+            logger.warning(f"{utility_type}: layer not loaded, skipping")
+            continue
+        points = sample_points(layer.geometries, args.points, rng)
+
+        # Containment runs against the tree's search pieces (see Config.spatial_subdivide_vertices)
+        cells, layer.cells = layer.cells, None
+        time_queries(spatial, points, utility_type)  # warm-up: keep first-touch costs out of either run
+        prepared_lat, prepared_res = time_queries(spatial, points, utility_type)
+        shapely.destroy_prepared(layer.pieces)
+        raw_lat, raw_res = time_queries(spatial, points, utility_type)
+        shapely.prepare(layer.pieces)
+        layer.cells = cells
+
+        speedup = statistics.fmean(raw_lat) / statistics.fmean(prepared_lat)
+        print(f"\n{utility_type} ({len(layer)} polygons, {len(points)} points)")
+        print(f"  raw:      {summarize(raw_lat)}")
+        print(f"  prepared: {summarize(prepared_lat)}")
+        print(f"  speedup:  {speedup:.1f}x   identical results: {raw_res == prepared_res}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Build the prebuilt spatial snapshot used by SpatialIndex at startup.
+
+Usage:
+    python build_spatial_snapshot.py
+    python build_spatial_snapshot.py --layer Water
+    python build_spatial_snapshot.py --out /tmp/spatial_snapshot
+    python build_spatial_snapshot.py --cell-levels 6 14
+    python build_spatial_snapshot.py --no-cells
+
+Reads the electric, gas and water source layers once, fixes invalid geometries,
+reprojects to the engine CRS and pre-computes _area_km2, then writes one
+GeoParquet file per layer plus manifest.json to data/spatial_snapshot/.
+Each layer also gets a cell lookup table (<layer>.cells.npz): quadtree cells
+at --cell-levels that lie entirely inside a fixed polygon set, so queries in
+those cells skip the geometry test.
+
+The manifest records each source file's size and mtime. The engine ignores a
+snapshot layer whose source file has changed since it was built, so rerun this
+script after every HIFLD / EPA CWS data refresh.
+"""
+
+import argparse
+import logging
+import time
+from pathlib import Path
+
+from lookup_engine.config import Config
+from lookup_engine.spatial_index import SpatialIndex
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the prebuilt spatial snapshot")
+    parser.add_argument("--out", type=Path, help="Snapshot directory (default: Config.spatial_snapshot_dir)")
+    parser.add_argument("--layer", choices=["Electric", "Gas", "Water"], action="append",
+                        help="Build only this layer (repeatable)")
+    parser.add_argument("--cell-levels", type=int, nargs=2, default=[6, 13], metavar=("MIN", "MAX"),
+                        help="Quadtree levels for the cell lookup table (default: 6 13)")
+    parser.add_argument("--no-cells", action="store_true", help="Skip the cell lookup table")
+    args = parser.parse_args()
+
+    config = Config()
+    t0 = time.time()
+    manifest = SpatialIndex(config).build_snapshot(
+        out_dir=args.out, labels=args.layer,
+        cell_levels=None if args.no_cells else tuple(args.cell_levels),
+    )
+    for name, entry in manifest["layers"].items():
+        logger.info(f"  {name}: {entry['records']} records ({entry['file']}, cells: {entry.get('cells') or 'none'})")
+    logger.info(f"Snapshot built in {time.time() - t0:.1f}s -> {args.out or config.spatial_snapshot_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Compact the lookup cache database offline.
+
+Usage:
+    python compact_lookup_cache.py
+    python compact_lookup_cache.py --db /data/lookup_cache.db
+
+Converts a cache file created before incremental auto_vacuum with one full
+VACUUM, then runs a maintenance pass (expiry, size caps, payload GC) that
+returns free pages to the filesystem. The VACUUM rewrites the whole file and
+blocks every writer, so stop the API (or point it at another file) first.
+New cache files are created in incremental mode and never need this.
+"""
+
+import argparse
+import logging
+import os
+import time
+from pathlib import Path
+
+from lookup_engine.cache import LookupCache
+from lookup_engine.config import Config
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact the lookup cache database offline")
+    parser.add_argument("--db", type=Path, help="Cache database (default: Config.cache_db)")
+    args = parser.parse_args()
+
+    config = Config()
+    db_path = args.db or config.cache_db
+    if not db_path.exists():
+        logger.error(f"No cache database at {db_path}")
+        raise SystemExit(1)
+
+    t0 = time.time()
+    size_before = os.path.getsize(db_path)
+    cache = LookupCache(
+        db_path, config.cache_ttl_days, memory_size=0,
+        stale_grace_days=config.cache_stale_grace_days,
+        max_entries=config.cache_max_entries, max_bytes=config.cache_max_bytes,
+    )
+    try:
+        cache.enable_incremental_vacuum()
+        cache.maintain()
+    finally:
+        cache.close()
+    logger.info(f"Compacted {db_path}: {size_before / 1e6:.1f} MB -> {os.path.getsize(db_path) / 1e6:.1f} MB "
+                f"in {time.time() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
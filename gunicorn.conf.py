@@ -0,0 +1,34 @@
+"""
+Gunicorn config for running the API with several workers.
+
+The engine (spatial layers, normalizer, catalogs) is loaded once in the
+master process and shared copy-on-write by the forked workers, so N workers
+cost roughly one copy of the layers instead of N.
+
+Usage:
+    gunicorn -c gunicorn.conf.py api:app
+
+Env:
+    PORT             listen port (default 8080)
+    WEB_CONCURRENCY  number of workers (default 2)
+"""
+
+import os
+import sys
+
+# Tell api.py to load the engine at import time, before workers fork.
+os.environ.setdefault("PRELOAD_ENGINE", "1")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+timeout = 120
+keepalive = 120
+
+
+def post_fork(server, worker):
+    """Give each worker its own database connections."""
+    api = sys.modules.get("api")
+    if api is not None and api.engine is not None:
+        api.engine.after_fork()
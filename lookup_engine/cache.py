@@ -1,10 +1,18 @@
 """SQLite-based address lookup cache."""
 
+import atexit
+import hashlib
 import json
 import logging
+import math
+import os
 import re
 import sqlite3
+import sys
+import threading
 import time
+import zlib
+from collections import OrderedDict
 from pathlib import Path
 from typing import Optional
 
@@ -29,94 +37,982 @@ def _normalize_address_key(address: str) -> str:
     return key
 
 
+def result_tags(result: LookupResult, state: str = "", zip_code: str = "", extra=()) -> list:
+    """
+    Dependency tags for a lookup result, used by LookupCache.invalidate_tag().
+
+    zip:<zip>, state:<st>, and per utility: <type>:<polygon_source> (e.g.
+    electric:state_gis_tx), source:<polygon_source>, <type>_eia:<eia_id> (HIFLD
+    territory id) and provider:<canonical_id>. extra adds caller-supplied
+    tags such as data versions.
+    """
+    tags = set()
+    if zip_code:
+        tags.add(f"zip:{zip_code}")
+    if state:
+        tags.add(f"state:{state}")
+    for utype in ("electric", "gas", "water", "sewer", "trash"):
+        pr = getattr(result, utype)
+        if pr is None:
+            continue
+        if pr.polygon_source:
+            tags.add(f"{utype}:{pr.polygon_source}")
+            tags.add(f"source:{pr.polygon_source}")
+        if pr.eia_id:
+            tags.add(f"{utype}_eia:{pr.eia_id}")
+        if pr.canonical_id:
+            tags.add(f"provider:{pr.canonical_id}")
+    tags.update(extra)
+    return sorted(_normalize_tag(t) for t in tags)
+
+
+def _normalize_tag(tag: str) -> str:
+    return re.sub(r"\s+", " ", str(tag).lower().strip())
+
+
+class LRUCache:
+    """Bounded, thread-safe in-process LRU map with hit/miss counters."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def reset_after_fork(self):
+        """New lock in a forked child (the parent's may have been held at fork); entries are kept."""
+        self._lock = threading.Lock()
+
+    def keys(self) -> list:
+        """Keys, most recently used first."""
+        with self._lock:
+            return list(reversed(self._data))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SpatialCellCache(LRUCache):
+    """
+    LRU of spatial query results keyed by (utility_type, quantized lat/lon cell).
+
+    The spatial backends only store results for a cell after proving it lies
+    inside one fixed polygon set (and touches no other polygon), so a hit is
+    exact for every point in the cell. Proving costs an extra geometry test,
+    so it is only attempted the second time a cell is queried; cells that fail
+    are remembered as boundary cells and never retried. Results are copied in
+    and out so callers can't mutate cached dicts.
+    """
+
+    # Cell bounds are padded so rounding in the point -> cell mapping can't
+    # place a point just outside the box that was proven.
+    _EPS = 1e-9
+    _SEEN = "seen"
+    _BOUNDARY = "boundary"
+
+    def __init__(self, maxsize: int, precision: int = 4):
+        super().__init__(maxsize)
+        self.precision = precision
+        self._scale = 10 ** precision
+
+    def cell(self, lat: float, lon: float) -> Optional[tuple]:
+        if self.maxsize <= 0 or not (math.isfinite(lat) and math.isfinite(lon)):
+            return None
+        return (math.floor(lon * self._scale), math.floor(lat * self._scale))
+
+    def bounds(self, cell: tuple) -> tuple:
+        """(minx, miny, maxx, maxy) of a cell in lon/lat."""
+        qx, qy = cell
+        return (qx / self._scale - self._EPS, qy / self._scale - self._EPS,
+                (qx + 1) / self._scale + self._EPS, (qy + 1) / self._scale + self._EPS)
+
+    def lookup(self, utility_type: str, cell: tuple) -> tuple:
+        """
+        (results, prove): cached results (a copy) or None, and whether the
+        caller should try to prove the cell uniform on this query.
+        """
+        key = (utility_type, cell)
+        value = self.get(key)
+        if isinstance(value, tuple):
+            return [dict(r) for r in value], False
+        # Only cached results count as hits
+        if value is not None:
+            with self._lock:
+                self.hits -= 1
+                self.misses += 1
+        else:
+            self.put(key, self._SEEN)
+        return None, value == self._SEEN
+
+    def store(self, utility_type: str, cell: tuple, results: Optional[list]):
+        """Cache results for a proven cell, or None to mark it a boundary cell."""
+        value = self._BOUNDARY if results is None else tuple(dict(r) for r in results)
+        self.put((utility_type, cell), value)
+
+
+class SQLiteConnections:
+    """
+    Per-thread connections to one SQLite database file, safe to share across
+    threads and processes: WAL journaling (readers never block the writer)
+    and busy_timeout (writers in other processes wait for the lock instead
+    of failing). auto_vacuum (e.g. "INCREMENTAL") applies to newly created
+    database files only; an existing file keeps its mode until a VACUUM.
+    """
+
+    def __init__(self, db_path: Path, busy_timeout_ms: int = 5000, auto_vacuum: Optional[str] = None):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._generation = 0  # bumped to retire every thread's connection
+        self._conns: list = []
+        self._orphaned: list = []  # inherited across fork; never closed or finalized here
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        if auto_vacuum:
+            # Must precede journal_mode, which writes the header of a new file
+            self.get().execute(f"PRAGMA auto_vacuum={auto_vacuum}")
+        self.get().execute("PRAGMA journal_mode=WAL")  # persistent: set once per database
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=self.busy_timeout_ms / 1000,
+                               check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA synchronous=NORMAL")  # safe under WAL
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-16000")  # ~16 MB page cache
+        return conn
+
+    def get(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use."""
+        local = self._local
+        if getattr(local, "generation", None) != self._generation:
+            local.conn = self._connect()
+            local.generation = self._generation
+            with self._lock:
+                self._conns.append(local.conn)
+        return local.conn
+
+    def close_all(self):
+        """Close every thread's connection; threads reconnect on next use."""
+        with self._lock:
+            conns, self._conns = self._conns, []
+            self._generation += 1
+        for conn in conns:
+            conn.close()
+
+    def reset_after_fork(self):
+        """
+        Retire the connections inherited from the parent without closing them.
+
+        Closing one in the child (including implicitly, when it is garbage
+        collected) can checkpoint or remove the WAL the parent is still using,
+        so they are kept referenced in _orphaned for the life of the process.
+        """
+        self._orphaned.extend(self._conns)
+        self._conns = []
+        self._lock = threading.Lock()
+        self._generation += 1
+
+
+# Compact cache encoding: a positional row, JSON-serialized and zlib-compressed.
+# Field order is fixed by these tuples; bump _ENCODING_VERSION when they change.
+# Version 2 rows hold a payload hash per provider slot instead of the provider
+# itself; each distinct provider payload is stored once in provider_payloads.
+# Version 1 rows (providers inline) are still read.
+_ENCODING_VERSION = 2
+_PR_FIELDS = (
+    "provider_name", "canonical_id", "eia_id", "utility_type", "confidence",
+    "match_method", "is_deregulated", "deregulated_note", "polygon_source",
+    "needs_review", "alternatives", "catalog_id", "catalog_title",
+    "id_match_score", "id_confident", "phone", "website",
+)
+_PR_SLOTS = ("electric", "gas", "water", "sewer", "trash")
+# Location-level entries share lookup_cache under this key prefix (no address starts with it)
+_LOCATION_PREFIX = "@loc|"
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _encode_result(result: LookupResult) -> tuple[list, dict]:
+    """
+    LookupResult -> (positional row, {payload hash: packed provider payload}).
+    The row references providers by hash; identical providers share a hash.
+    """
+    row_hashes, payloads = [], {}
+    for slot in _PR_SLOTS:
+        pr = getattr(result, slot)
+        if pr is None:
+            row_hashes.append(None)
+            continue
+        values = [getattr(pr, f) for f in _PR_FIELDS]
+        values[4] = round(pr.confidence, 3)
+        raw = _dumps(values)
+        digest = hashlib.blake2b(raw, digest_size=16).hexdigest()
+        payloads[digest] = zlib.compress(raw)
+        row_hashes.append(digest)
+    row = [
+        _ENCODING_VERSION, result.address,
+        round(result.lat, 6), round(result.lon, 6), round(result.geocode_confidence, 3),
+        row_hashes, result.internet, result.lookup_time_ms, result.timestamp,
+    ]
+    return row, payloads
+
+
+def _decode_result(row: list, providers: list) -> LookupResult:
+    """Positional row + provider value lists (one per slot) -> LookupResult. Provider names are interned."""
+    _, address, lat, lon, geocode_confidence, _, internet, lookup_time_ms, timestamp = row
+    result = LookupResult(
+        address=address, lat=lat, lon=lon, geocode_confidence=geocode_confidence,
+        internet=internet, lookup_time_ms=lookup_time_ms, timestamp=timestamp,
+    )
+    for slot, values in zip(_PR_SLOTS, providers):
+        if values is not None:
+            pr = ProviderResult(**dict(zip(_PR_FIELDS, values)))
+            pr.provider_name = sys.intern(pr.provider_name or "")
+            pr.alternatives = list(pr.alternatives or [])
+            setattr(result, slot, pr)
+    return result
+
+
+def _pack_row(row: list) -> bytes:
+    return zlib.compress(_dumps(row))
+
+
+def _unpack_value(value):
+    """
+    Stored value -> current-version row, or a LookupResult for rows in an
+    older format (v1 blob, JSON text) that should be re-encoded. None if unreadable.
+    """
+    try:
+        if isinstance(value, (bytes, memoryview)):
+            row = json.loads(zlib.decompress(value))
+            if row[0] == _ENCODING_VERSION:
+                return row
+            if row[0] == 1:
+                return _decode_result(row, row[5])
+            return None
+        return LookupCache._dict_to_result(json.loads(value))
+    except (json.JSONDecodeError, zlib.error, KeyError, TypeError, ValueError, IndexError):
+        return None
+
+
 class LookupCache:
-    """SQLite cache for address lookup results."""
+    """
+    SQLite cache for address lookup results, with two tiers.
+
+    Hot addresses are served from an in-process LRU (memory_size entries)
+    without touching disk. Writes go to a pending map that a background
+    thread flushes to SQLite in one transaction every flush_interval seconds,
+    so put() never waits on a commit. Entries are stored as compressed
+    positional rows (see _encode_result) that reference provider payloads by
+    hash: the identical electric/gas/water/sewer results shared by every
+    address in a ZIP are stored once, and held once in the payload memory
+    tier (payload_memory_size). Rows in older formats are still read and are
+    rewritten in the current format on first hit.
+
+    With stale_grace_days, get_entry() keeps returning an entry for that long
+    after it expires, flagged stale (soft TTL: expires_at; hard TTL: expires_at
+    plus the grace period).
+
+    max_entries / max_bytes cap the database (0 = unlimited): maintenance
+    evicts least recently accessed rows down to the cap. Accesses are recorded
+    in memory and written with the next flush, not per read. With
+    maintenance_interval, a background thread runs maintain() periodically.
 
-    def __init__(self, db_path: Path, ttl_days: int = 90):
+    Besides address-text keys, results can be cached under their geocoded
+    location (get_location/put_location), so a new spelling of a known
+    address is answered right after geocoding.
+
+    Entries can carry dependency tags (see result_tags()); invalidate_tag()
+    removes only the entries that depended on, say, one state GIS endpoint,
+    one ZIP or an old data version, instead of clearing the whole cache.
+
+    Safe to share across threads and processes: each thread gets its own
+    connection, the database runs in WAL mode (readers never block the
+    writer), and busy_timeout makes writers from other processes wait for the
+    lock instead of failing. The memory tier is per process: invalidate(),
+    invalidate_tag() and clear() bump a generation counter in SQLite, and
+    every process's writer thread drops its memory tier when it sees the
+    counter move, so other workers stop serving removed entries within
+    about flush_interval.
+    """
+
+    def __init__(self, db_path: Path, ttl_days: int = 90, memory_size: int = 5000,
+                 flush_interval: float = 1.0, busy_timeout_ms: int = 5000,
+                 payload_memory_size: int = 20000, stale_grace_days: float = 0,
+                 max_entries: int = 0, max_bytes: int = 0, maintenance_interval: float = 0):
         self.db_path = db_path
         self.ttl_days = ttl_days
-        self._conn: Optional[sqlite3.Connection] = None
+        self.stale_grace_days = stale_grace_days
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.maintenance_interval = maintenance_interval
+        self.flush_interval = flush_interval
+        self.busy_timeout_ms = busy_timeout_ms
+        self.memory = LRUCache(memory_size)  # key -> (expires_at, positional row)
+        self.payloads = LRUCache(payload_memory_size)  # payload hash -> provider values
+        self._db = SQLiteConnections(db_path, busy_timeout_ms, auto_vacuum="INCREMENTAL")
+        self._vacuum_hint_logged = False
         self._init_db()
+        self._start_writer()
+        # Scripts that never call close() still get their pending writes flushed
+        atexit.register(self.close)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        return self._db.get()
 
     def _init_db(self):
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
-        self._conn.execute("""
+        conn = self._conn
+        conn.execute("""
             CREATE TABLE IF NOT EXISTS lookup_cache (
                 address_key TEXT PRIMARY KEY,
-                result_json TEXT NOT NULL,
+                result_json TEXT NOT NULL,  -- compressed row BLOB (legacy rows: JSON text)
                 created_at REAL NOT NULL,
                 expires_at REAL NOT NULL
             )
         """)
-        self._conn.execute("""
+        conn.execute("""
             CREATE INDEX IF NOT EXISTS idx_expires ON lookup_cache(expires_at)
         """)
-        self._conn.commit()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS provider_payloads (
+                hash TEXT PRIMARY KEY,
+                payload BLOB NOT NULL
+            )
+        """)
+        # Columns added after the first release: access time for LRU eviction,
+        # and the payload hashes a row references (for payload GC)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(lookup_cache)")}
+        if "last_access" not in columns:
+            conn.execute("ALTER TABLE lookup_cache ADD COLUMN last_access REAL")
+        if "payload_hashes" not in columns:
+            conn.execute("ALTER TABLE lookup_cache ADD COLUMN payload_hashes TEXT")
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_last_access ON lookup_cache(last_access)
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_tags (
+                tag TEXT NOT NULL,
+                address_key TEXT NOT NULL,
+                PRIMARY KEY (tag, address_key)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tags_key ON cache_tags(address_key)
+        """)
+        # Bumped by every invalidation; other processes drop their memory tier when it moves
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_meta (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        conn.execute("INSERT OR IGNORE INTO cache_meta (name, value) VALUES ('generation', 0)")
+        conn.commit()
+        self._generation = self._read_generation(conn)
+
+    def _start_writer(self):
+        """Start the write-behind thread (fresh locks and queue)."""
+        self._write_lock = threading.Lock()    # orders writes within this process
+        self._pending_lock = threading.Lock()  # guards the two pending maps only
+        self._pending: dict = {}               # key -> (packed row, created_at, expires_at, payload hashes)
+        self._pending_payloads: dict = {}      # payload hash -> packed provider payload
+        self._pending_tags: dict = {}          # key -> dependency tags replacing the stored ones
+        self._touched: dict = {}               # key -> last access time, for LRU eviction
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._writer_loop, name="lookup-cache-writer", daemon=True)
+        self._writer.start()
+        self._maintainer = None
+        if self.maintenance_interval > 0:
+            self._maintainer = threading.Thread(target=self._maintenance_loop, name="lookup-cache-maintenance",
+                                                daemon=True)
+            self._maintainer.start()
+
+    def _writer_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                self._check_generation()
+            except sqlite3.Error as e:
+                logger.warning(f"Cache: write-behind flush failed: {e}")
+
+    @staticmethod
+    def _read_generation(conn) -> int:
+        row = conn.execute("SELECT value FROM cache_meta WHERE name = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def _bump_generation(self, conn):
+        """Signal an invalidation to other processes (call inside the deleting transaction)."""
+        conn.execute("UPDATE cache_meta SET value = value + 1 WHERE name = 'generation'")
+        generation = self._read_generation(conn)
+        # Only skip our own bump; a missed bump from another process must still clear the tier
+        if generation == self._generation + 1:
+            self._generation = generation
+
+    def _check_generation(self):
+        """Drop the memory tiers if another process invalidated entries since the last check."""
+        generation = self._read_generation(self._conn)
+        if generation != self._generation:
+            self.memory.clear()
+            self._generation = generation
+            logger.debug(f"Cache: memory tier dropped after invalidation elsewhere (generation {generation})")
+
+    def flush(self) -> int:
+        """Write all pending entries to SQLite in one transaction. Returns count written."""
+        with self._write_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, {}
+                payloads, self._pending_payloads = self._pending_payloads, {}
+                tags, self._pending_tags = self._pending_tags, {}
+                touched, self._touched = self._touched, {}
+            if not batch and not payloads and not touched:
+                return 0
+            conn = self._conn
+            try:
+                # Payloads first so committed rows never reference a missing payload
+                conn.executemany(
+                    "INSERT OR IGNORE INTO provider_payloads (hash, payload) VALUES (?, ?)",
+                    list(payloads.items()),
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO lookup_cache "
+                    "(address_key, result_json, created_at, expires_at, payload_hashes, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(key, value, created, expires, hashes, max(created, touched.get(key, 0.0)))
+                     for key, (value, created, expires, hashes) in batch.items()],
+                )
+                conn.executemany(
+                    "UPDATE lookup_cache SET last_access = ? WHERE address_key = ?",
+                    [(at, key) for key, at in touched.items() if key not in batch],
+                )
+                conn.executemany("DELETE FROM cache_tags WHERE address_key = ?", [(key,) for key in tags])
+                conn.executemany(
+                    "INSERT OR IGNORE INTO cache_tags (tag, address_key) VALUES (?, ?)",
+                    [(tag, key) for key, key_tags in tags.items() for tag in key_tags],
+                )
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                # Put the batch back (newer puts win) so the next flush retries it
+                with self._pending_lock:
+                    self._pending = {**batch, **self._pending}
+                    self._pending_payloads = {**payloads, **self._pending_payloads}
+                    self._pending_tags = {**tags, **self._pending_tags}
+                raise
+        return len(batch)
 
     def get(self, address: str) -> Optional[LookupResult]:
         """Get cached result for address, or None if not cached / expired."""
+        result, stale = self.get_entry(address)
+        return None if stale else result
+
+    def get_entry(self, address: str) -> tuple[Optional[LookupResult], bool]:
+        """
+        (result, stale) for address. Within stale_grace_days after expiry the
+        entry is still returned with stale=True, so the caller can serve it
+        and refresh it in the background; beyond that it is (None, False).
+        """
         key = _normalize_address_key(address)
         if not key:
-            return None
-        row = self._conn.execute(
-            "SELECT result_json FROM lookup_cache WHERE address_key = ? AND expires_at > ?",
-            (key, time.time()),
-        ).fetchone()
-        if not row:
-            return None
-        try:
-            data = json.loads(row[0])
-            return self._dict_to_result(data)
-        except (json.JSONDecodeError, KeyError):
-            return None
+            return None, False
+        return self._get_key(key, self.stale_grace_days * 86400)[:2]
+
+    def get_location(self, location_key: str) -> Optional[LookupResult]:
+        """Get the cached result for a geocoded location (see location_key())."""
+        return self.get_location_entry(location_key)[0]
 
-    def put(self, address: str, result: LookupResult):
-        """Cache a lookup result."""
+    def get_location_entry(self, location_key: str) -> tuple[Optional[LookupResult], float]:
+        """(result, expires_at) for a geocoded location; (None, 0.0) if not cached / expired."""
+        if not location_key:
+            return None, 0.0
+        result, _, expires = self._get_key(location_key)
+        return result, expires
+
+    @staticmethod
+    def location_key(lat: float, lon: float, state: str = "", zip_code: str = "",
+                     city: str = "", county: str = "", block_geoid: str = "") -> str:
+        """
+        Cache key for a geocoded location: rounded coordinates plus everything
+        the provider lookup derives from the geocode. Different spellings of
+        one address geocode to the same key.
+        """
+        parts = (f"{lat:.6f}", f"{lon:.6f}", state, zip_code, city, county, block_geoid)
+        return _LOCATION_PREFIX + "|".join(str(p or "").strip().lower() for p in parts)
+
+    def _get_key(self, key: str, grace: float = 0.0) -> tuple[Optional[LookupResult], bool, float]:
+        """
+        (result, stale, expires_at) for a cache key; entries up to grace
+        seconds past expiry count as stale.
+        """
+        now = time.time()
+
+        hot = self.memory.get(key)
+        if hot is not None:
+            expires, row = hot
+            if expires + grace > now:
+                providers = self._load_payloads(row[5])
+                if providers is not None:
+                    self._touch(key, now)
+                    return _decode_result(row, providers), expires <= now, expires
+            if expires <= now:
+                self.memory.pop(key)
+
+        with self._pending_lock:
+            pending = self._pending.get(key)
+        if pending is not None:
+            value, created, expires, _ = pending
+        else:
+            stored = self._conn.execute(
+                "SELECT result_json, created_at, expires_at FROM lookup_cache WHERE address_key = ? AND expires_at > ?",
+                (key, now - grace),
+            ).fetchone()
+            if not stored:
+                return None, False, 0.0
+            value, created, expires = stored
+        if expires + grace <= now:
+            return None, False, 0.0
+        row = _unpack_value(value)
+        if isinstance(row, LookupResult):
+            # Older format: rewrite it as a current row (keeping its expiry)
+            row = self._store(key, row, created, expires)
+        if row is None:
+            return None, False, 0.0
+        providers = self._load_payloads(row[5])
+        if providers is None:
+            return None, False, 0.0
+        if expires > now:
+            self.memory.put(key, (expires, row))
+        self._touch(key, now)
+        return _decode_result(row, providers), expires <= now, expires
+
+    def _touch(self, key: str, now: float):
+        """Record an access; written with the next flush (no write per read)."""
+        with self._pending_lock:
+            self._touched[key] = now
+
+    def _load_payloads(self, hashes: list) -> Optional[list]:
+        """Provider values for each payload hash (None slots stay None); None if any is missing."""
+        resolved = {}
+        for h in hashes:
+            if h is not None and h not in resolved:
+                values = self.payloads.get(h)
+                if values is not None:
+                    resolved[h] = values
+        missing = [h for h in hashes if h is not None and h not in resolved]
+        if missing:
+            with self._pending_lock:
+                found = {h: self._pending_payloads[h] for h in missing if h in self._pending_payloads}
+            rest = [h for h in missing if h not in found]
+            if rest:
+                placeholders = ",".join("?" * len(rest))
+                found.update(self._conn.execute(
+                    f"SELECT hash, payload FROM provider_payloads WHERE hash IN ({placeholders})", rest,
+                ).fetchall())
+            for h in missing:
+                if h not in found:
+                    logger.warning(f"Cache: provider payload {h} missing")
+                    return None
+                resolved[h] = json.loads(zlib.decompress(found[h]))
+                self.payloads.put(h, resolved[h])
+        return [None if h is None else resolved[h] for h in hashes]
+
+    def _store(self, key: str, result: LookupResult, created: float, expires: float,
+               tags=None) -> list:
+        """
+        Queue result for writing; prime both memory tiers. Returns the (detached) row.
+        tags replace the key's stored dependency tags; None leaves them as they are.
+        """
+        row, payloads = _encode_result(result)
+        packed = _pack_row(row)
+        row = json.loads(zlib.decompress(packed))  # detached from result's mutable fields
+        for digest, payload in payloads.items():
+            self.payloads.put(digest, json.loads(zlib.decompress(payload)))
+        with self._pending_lock:
+            self._pending[key] = (packed, created, expires, " ".join(payloads))
+            self._pending_payloads.update(payloads)
+            if tags is not None:
+                self._pending_tags[key] = tuple(_normalize_tag(t) for t in tags)
+        return row
+
+    def put(self, address: str, result: LookupResult, tags=(), expires_at: Optional[float] = None):
+        """
+        Cache a lookup result, with its dependency tags (see result_tags()).
+        expires_at keeps an existing entry's expiry when the result is copied
+        from another key (default: now + ttl_days). Written to SQLite by the
+        write-behind thread.
+        """
         key = _normalize_address_key(address)
-        if not key:
-            return
+        if key:
+            self._put_key(key, result, tags, expires_at)
+
+    def put_location(self, location_key: str, result: LookupResult, tags=()):
+        """Cache a lookup result under its geocoded location (see location_key())."""
+        if location_key:
+            self._put_key(location_key, result, tags)
+
+    def _put_key(self, key: str, result: LookupResult, tags=(), expires_at: Optional[float] = None):
         now = time.time()
-        expires = now + (self.ttl_days * 86400)
-        result_json = json.dumps(result.to_dict())
-        self._conn.execute(
-            "INSERT OR REPLACE INTO lookup_cache (address_key, result_json, created_at, expires_at) VALUES (?, ?, ?, ?)",
-            (key, result_json, now, expires),
-        )
-        self._conn.commit()
+        ttl = self.ttl_days * 86400
+        expires = expires_at if expires_at is not None else now + ttl
+        created = min(now, expires - ttl)  # a copied entry keeps its age
+        self.memory.put(key, (expires, self._store(key, result, created, expires, tags)))
 
     def invalidate(self, address: str):
         """Remove a cached result."""
         key = _normalize_address_key(address)
-        self._conn.execute("DELETE FROM lookup_cache WHERE address_key = ?", (key,))
-        self._conn.commit()
+        with self._write_lock:
+            with self._pending_lock:
+                self._pending.pop(key, None)
+                self._pending_tags.pop(key, None)
+            self.memory.pop(key)
+            with self._conn as conn:
+                conn.execute("DELETE FROM lookup_cache WHERE address_key = ?", (key,))
+                conn.execute("DELETE FROM cache_tags WHERE address_key = ?", (key,))
+                self._bump_generation(conn)
+
+    def invalidate_tag(self, tag: str) -> int:
+        """
+        Remove every entry carrying tag, e.g. "electric:state_gis_tx" or
+        "zip:75201". Returns count of entries removed.
+        """
+        tag = _normalize_tag(tag)
+        self.flush()
+        with self._write_lock:
+            with self._pending_lock:
+                # Written after the flush above: drop them before they land
+                queued = [key for key, key_tags in self._pending_tags.items() if tag in key_tags]
+                for key in queued:
+                    self._pending.pop(key, None)
+                    self._pending_tags.pop(key, None)
+            with self._conn as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                keys = [key for (key,) in conn.execute(
+                    "SELECT address_key FROM cache_tags WHERE tag = ?", (tag,))]
+                conn.executemany("DELETE FROM lookup_cache WHERE address_key = ?", [(k,) for k in keys])
+                conn.executemany("DELETE FROM cache_tags WHERE address_key = ?", [(k,) for k in keys])
+                if keys or queued:
+                    self._bump_generation(conn)
+            for key in (*keys, *queued):
+                self.memory.pop(key)
+        count = len(set(keys) | set(queued))
+        logger.info(f"Cache: invalidated {count} entries tagged '{tag}'")
+        return count
+
+    def tag_counts(self, prefix: str = "") -> dict:
+        """Entries per tag, optionally only tags starting with prefix."""
+        self.flush()
+        rows = self._conn.execute(
+            "SELECT tag, COUNT(*) FROM cache_tags WHERE substr(tag, 1, ?) = ? GROUP BY tag ORDER BY tag",
+            (len(prefix), _normalize_tag(prefix)),
+        ).fetchall()
+        return dict(rows)
 
     def clear(self) -> int:
         """Remove all cache entries. Returns count of entries removed."""
         count = self.size
-        self._conn.execute("DELETE FROM lookup_cache")
-        self._conn.commit()
+        with self._write_lock:
+            with self._pending_lock:
+                self._pending.clear()
+                self._pending_payloads.clear()
+                self._pending_tags.clear()
+            self.memory.clear()
+            self.payloads.clear()
+            with self._conn as conn:
+                conn.execute("DELETE FROM lookup_cache")
+                conn.execute("DELETE FROM provider_payloads")
+                conn.execute("DELETE FROM cache_tags")
+                self._bump_generation(conn)
         logger.info(f"Cache: cleared all {count} entries")
         return count
 
     def clear_expired(self):
-        """Remove all expired entries."""
-        deleted = self._conn.execute(
-            "DELETE FROM lookup_cache WHERE expires_at <= ?", (time.time(),)
-        ).rowcount
-        self._conn.commit()
+        """Remove all entries past expiry plus the stale grace period."""
+        with self._write_lock, self._conn as conn:
+            deleted = conn.execute(
+                "DELETE FROM lookup_cache WHERE expires_at <= ?", (time.time() - self.stale_grace_days * 86400,)
+            ).rowcount
         if deleted:
             logger.info(f"Cache: cleared {deleted} expired entries")
 
+    def _maintenance_loop(self):
+        while not self._stop.wait(self.maintenance_interval):
+            try:
+                self.maintain()
+            except sqlite3.Error as e:
+                logger.warning(f"Cache: maintenance failed: {e}")
+
+    def maintain(self):
+        """
+        Purge expired rows, evict down to max_entries/max_bytes, drop provider
+        payloads and tags no row references, and return free pages to the
+        filesystem.
+        """
+        t0 = time.time()
+        self.flush()
+        self.clear_expired()
+        evicted = self._evict()
+        orphans = self._collect_payloads()
+        with self._write_lock, self._conn as conn:
+            conn.execute("DELETE FROM cache_tags WHERE address_key NOT IN (SELECT address_key FROM lookup_cache)")
+        freed = self._incremental_vacuum()
+        if evicted or orphans or freed:
+            logger.info(f"Cache maintenance: evicted {evicted} rows, dropped {orphans} payloads, "
+                        f"freed {freed} pages in {time.time() - t0:.1f}s")
+
+    def _used_bytes(self, conn) -> int:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        pages = conn.execute("PRAGMA page_count").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (pages - free) * page_size
+
+    def _evict(self) -> int:
+        """
+        Delete least recently accessed rows so both caps hold, with 5% headroom
+        so eviction doesn't run every time. The byte cap is estimated from the
+        average row size; page slack is reclaimed by later runs. Returns rows deleted.
+        """
+        if not self.max_entries and not self.max_bytes:
+            return 0
+        conn = self._conn
+        count = conn.execute("SELECT COUNT(*) FROM lookup_cache").fetchone()[0]
+        keep = count
+        if self.max_entries:
+            keep = min(keep, self.max_entries)
+        if self.max_bytes and count:
+            used = self._used_bytes(conn)
+            if used > self.max_bytes:
+                keep = min(keep, int(count * self.max_bytes / used))
+        if keep >= count:
+            return 0
+        keep -= keep // 20
+        with self._write_lock, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            keys = [key for (key,) in conn.execute(
+                "SELECT address_key FROM lookup_cache ORDER BY COALESCE(last_access, created_at) LIMIT ?",
+                (count - keep,),
+            )]
+            conn.executemany("DELETE FROM lookup_cache WHERE address_key = ?", [(k,) for k in keys])
+        # Only the evicted keys leave the hot tier
+        for key in keys:
+            self.memory.pop(key)
+        return len(keys)
+
+    def _collect_payloads(self) -> int:
+        """Delete provider payloads no cached row references. Returns payloads deleted."""
+        conn = self._conn
+        with self._write_lock:
+            # Rows written before payload_hashes existed: fill it in from the row itself
+            while True:
+                rows = conn.execute(
+                    "SELECT address_key, result_json FROM lookup_cache WHERE payload_hashes IS NULL LIMIT 5000"
+                ).fetchall()
+                if not rows:
+                    break
+                updates = []
+                for key, value in rows:
+                    row = _unpack_value(value) if isinstance(value, bytes) else None
+                    hashes = row[5] if isinstance(row, list) else []
+                    updates.append((" ".join(h for h in hashes if h), key))
+                with conn:
+                    conn.executemany("UPDATE lookup_cache SET payload_hashes = ? WHERE address_key = ?", updates)
+
+            # One write transaction: no other process can add references in between
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                referenced = set()
+                for (hashes,) in conn.execute("SELECT payload_hashes FROM lookup_cache WHERE payload_hashes != ''"):
+                    referenced.update(hashes.split())
+                orphans = [(h,) for (h,) in conn.execute("SELECT hash FROM provider_payloads")
+                           if h not in referenced]
+                conn.executemany("DELETE FROM provider_payloads WHERE hash = ?", orphans)
+        return len(orphans)
+
+    def _incremental_vacuum(self) -> int:
+        """
+        Release free pages to the filesystem. Returns pages freed. Files
+        created before incremental auto_vacuum need enable_incremental_vacuum()
+        once, offline; until then free pages are only reused.
+        """
+        conn = self._conn
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            if not self._vacuum_hint_logged:
+                self._vacuum_hint_logged = True
+                logger.info(f"Cache: {self.db_path} predates incremental auto_vacuum; free pages are reused "
+                            f"but not released (run compact_lookup_cache.py offline to convert it)")
+            return 0
+        with self._write_lock:
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if free:
+                # sqlite3's execute() steps a PRAGMA only once, which frees a
+                # single page; executescript() runs it to completion.
+                conn.commit()
+                conn.executescript("PRAGMA incremental_vacuum;")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        return free
+
+    def hot_keys(self, limit: int) -> list:
+        """
+        Up to limit keys, hottest first: this process's memory tier, then the
+        most recently accessed rows in SQLite.
+        """
+        keys = self.memory.keys()[:limit]
+        if len(keys) < limit:
+            self.flush()
+            seen = set(keys)
+            rows = self._conn.execute(
+                "SELECT address_key FROM lookup_cache WHERE expires_at > ? "
+                "ORDER BY COALESCE(last_access, created_at) DESC LIMIT ?",
+                (time.time(), limit),
+            )
+            keys += [key for (key,) in rows if key not in seen][:limit - len(keys)]
+        return keys
+
+    def save_snapshot(self, path: Path, limit: int) -> int:
+        """Write the hottest keys to path (JSON) for load_snapshot() at the next start."""
+        keys = self.hot_keys(limit)
+        path = Path(path)
+        # Per-process temp file: every worker saves at shutdown, and the
+        # atomic replace lets the last one win without interleaved writes
+        tmp = path.with_suffix(f"{path.suffix}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"saved_at": time.time(), "keys": keys}, f)
+            tmp.replace(path)
+        except OSError as e:
+            logger.warning(f"Cache: could not save hot-key snapshot to {path}: {e}")
+            tmp.unlink(missing_ok=True)
+            return 0
+        logger.info(f"Cache: saved {len(keys)} hot keys to {path}")
+        return len(keys)
+
+    def load_snapshot(self, path: Path) -> int:
+        """Load the keys saved by save_snapshot() into the memory tiers. Returns entries loaded."""
+        path = Path(path)
+        if not path.exists():
+            return 0
+        try:
+            with open(path) as f:
+                keys = json.load(f).get("keys", [])
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"Cache: ignoring unreadable hot-key snapshot {path}: {e}")
+            return 0
+        t0 = time.time()
+        # Coldest first, so the hottest keys end up most recent in the LRU
+        loaded = sum(1 for key in reversed(keys[:self.memory.maxsize]) if self._get_key(key)[0] is not None)
+        logger.info(f"Cache: warmed {loaded}/{len(keys)} hot keys from {path} in {time.time() - t0:.1f}s")
+        return loaded
+
+    def enable_incremental_vacuum(self):
+        """
+        Convert the file to incremental auto_vacuum with a full VACUUM. It
+        rewrites the whole database and blocks writers from every process
+        meanwhile, so run it offline (compact_lookup_cache.py), not from a server.
+        """
+        conn = self._conn
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return
+        t0 = time.time()
+        self.flush()
+        with self._write_lock:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        logger.info(f"Cache: converted {self.db_path} to incremental auto_vacuum in {time.time() - t0:.1f}s")
+
     @property
     def size(self) -> int:
+        self.flush()
         row = self._conn.execute("SELECT COUNT(*) FROM lookup_cache").fetchone()
         return row[0] if row else 0
 
+    @property
+    def stats(self) -> dict:
+        """Memory-tier counters plus the write-behind backlog."""
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {**self.memory.stats, "payloads": self.payloads.stats, "pending_writes": pending}
+
+    def stop_background(self):
+        """
+        Stop the writer and maintenance threads and flush pending writes.
+
+        A preloading master calls this before forking, so only the workers
+        (which start their own threads in reset_after_fork()) write to and
+        maintain the database. Later puts stay pending until close().
+        """
+        self._stop.set()
+        for thread in (self._writer, self._maintainer):
+            if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+                thread.join(timeout=5)
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            logger.warning(f"Cache: final flush failed: {e}")
+
     def close(self):
-        if self._conn:
-            self._conn.close()
-            self._conn = None
+        """Stop the writer, flush pending writes and close every thread's connection."""
+        atexit.unregister(self.close)
+        self.stop_background()
+        self._db.close_all()
+
+    def reset_after_fork(self):
+        """Retire inherited connections and start a fresh writer in a forked worker.
+
+        The inherited handles belong to the parent process; they are retired
+        but kept open (see SQLiteConnections.reset_after_fork). The
+        parent's writer thread does not exist here and its locks may have been
+        held at fork time, so both are recreated. The memory tiers keep their
+        entries, so a warm_start() in a preloading master carries over to
+        every worker.
+        """
+        self._db.reset_after_fork()
+        self.memory.reset_after_fork()
+        self.payloads.reset_after_fork()
+        self._init_db()
+        self._start_writer()
 
     @staticmethod
     def _dict_to_result(data: dict) -> LookupResult:
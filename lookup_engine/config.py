@@ -2,6 +2,7 @@
 
 from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Optional
 
 
 _ROOT = Path(__file__).parent.parent
@@ -14,6 +15,26 @@ class Config:
     gas_shp: Path = _ROOT / "240245-V1" / "gas_shp" / "NG_Service_Terr.shp"
     water_gpkg: Path = _ROOT / "CWS_Boundaries_Latest" / "CWS_2_1.gpkg"
 
+    # Prebuilt spatial snapshot (build_spatial_snapshot.py): pre-validated,
+    # pre-projected GeoParquet layers with area computed. Used instead of the
+    # shapefiles above when present and built from the same source files.
+    spatial_snapshot_dir: Path = _ROOT / "data" / "spatial_snapshot"
+
+    # Lazy regional loading: split each layer into lon/lat tiles of this many
+    # degrees and load a tile on its first query (2.0 is a good size). 0 loads
+    # the full national layers at startup.
+    spatial_partition_deg: float = 0.0
+    # Tiles covering these states are loaded at startup when partitioned
+    spatial_preload_states: list = field(default_factory=list)
+    # Polygons with more vertices than this are cut into grid-bounded pieces
+    # for the spatial tree (tighter candidates, cheaper containment). 0 = off.
+    spatial_subdivide_vertices: int = 512
+    # LRU of spatial answers keyed by (type, lat/lon rounded down to this many
+    # decimals — 4 is ~11 m). Only cells proven to lie inside one fixed polygon
+    # set are cached, so hits are exact. Size 0 disables it.
+    spatial_cache_size: int = 20000
+    spatial_cache_precision: int = 4
+
     # Data files
     canonical_file: Path = _ROOT / "data" / "canonical_providers.json"
     reps_file: Path = _ROOT / "data" / "deregulated_reps.json"
@@ -21,10 +42,29 @@ class Config:
     # Cache
     cache_db: Path = _ROOT / "data" / "lookup_cache.db"
     cache_ttl_days: int = 90
+    cache_stale_grace_days: int = 30  # serve expired entries this long while refreshing them
+    cache_refresh_workers: int = 2
+    cache_memory_size: int = 5000  # in-process LRU tier in front of SQLite
+    cache_payload_memory_size: int = 20000  # distinct provider payloads held in memory
+    cache_flush_interval: float = 1.0  # seconds between write-behind flushes
+    cache_max_entries: int = 1_000_000  # least-recently-used rows evicted beyond this; 0 = unbounded
+    cache_max_bytes: int = 1 << 30  # database size cap in bytes; 0 = unbounded
+    cache_maintenance_interval: float = 3600  # seconds between evict/GC/vacuum passes; 0 disables
+
+    # Warm start: hot lookup-cache keys are saved at shutdown and reloaded at
+    # boot; addresses from a JSONL request log can be replayed on top.
+    warm_snapshot_file: Optional[Path] = _ROOT / "data" / "lookup_cache_hot.json"  # None disables
+    warm_snapshot_size: int = 5000
+    warm_replay_log: Optional[Path] = None
+    warm_replay_limit: int = 1000  # most recent distinct addresses replayed
+    warm_replay_workers: int = 4
 
     # Geocoder
     geocoder_type: str = "census"  # "census", "google", or "chained" (Census + Google fallback)
     google_api_key: str = ""
+    geocode_cache_db: Optional[Path] = _ROOT / "data" / "geocode_cache.db"  # None disables
+    geocode_cache_ttl_days: float = 180
+    geocode_cache_negative_ttl_days: float = 1  # answered no-matches only (failed requests are never cached); short so new addresses show up
 
     # Scoring thresholds
     max_confidence: float = 0.98
@@ -32,6 +72,12 @@ class Config:
     # Spatial
     target_crs: str = "EPSG:4326"  # WGS84 for lat/lon queries
 
+    # PostGIS backend (POSTGIS_URL): connection pool size and per-query timeout
+    postgis_pool_min: int = 1
+    postgis_pool_max: int = 8
+    postgis_statement_timeout_ms: int = 5000
+    postgis_batch_size: int = 500  # points per statement in query_points()
+
     # ERCOT TDU names in the electric shapefile (for deregulated detection)
     ercot_tdu_names: list = field(default_factory=lambda: [
         "ONCOR ELECTRIC DELIVERY COMPANY LLC",
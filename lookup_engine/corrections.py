@@ -5,6 +5,7 @@ Human-verified corrections override all other sources. Supports:
 - ZIP-level corrections from JSON files
 """
 
+import hashlib
 import json
 import logging
 import sqlite3
@@ -153,6 +154,40 @@ class CorrectionsLookup:
 
         return None
 
+    def has_address_correction(self, address: str) -> bool:
+        """True if any utility type has an exact-address correction."""
+        if not self._db_available:
+            return False
+
+        try:
+            conn = sqlite3.connect(self._db_path)
+            row = conn.execute(
+                "SELECT 1 FROM address_corrections WHERE address = ? LIMIT 1", (address,),
+            ).fetchone()
+            conn.close()
+            return row is not None
+        except sqlite3.Error as e:
+            logger.warning(f"Corrections DB error: {e}")
+        return False
+
+    def version(self) -> str:
+        """
+        Short fingerprint of the loaded ZIP corrections and the corrections DB
+        (row counts and latest ids). Changes whenever a correction is added.
+        """
+        h = hashlib.blake2b(digest_size=6)
+        h.update(json.dumps(self._zip_corrections, sort_keys=True, default=str).encode())
+        if self._db_available:
+            try:
+                conn = sqlite3.connect(self._db_path)
+                for table in ("address_corrections", "id_mapping_corrections"):
+                    row = conn.execute(f"SELECT COUNT(*), MAX(id) FROM {table}").fetchone()
+                    h.update(repr(row).encode())
+                conn.close()
+            except sqlite3.Error as e:
+                logger.warning(f"Corrections DB error: {e}")
+        return h.hexdigest()
+
     def lookup_by_zip(self, zip_code: str, utility_type: str) -> Optional[dict]:
         """ZIP-level correction override."""
         corrections = self._zip_corrections.get(utility_type, {})
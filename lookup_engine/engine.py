@@ -1,15 +1,20 @@
 """Main LookupEngine — orchestrates geocoding, spatial lookup, normalization, and scoring."""
 
+import hashlib
+import json
 import logging
 import os
 import re
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 
-from .cache import LookupCache
+from .cache import LookupCache, result_tags
 from .config import Config
-from .geocoder import Geocoder, create_geocoder, get_census_block_geoid
+from .geocoder import CachingGeocoder, Geocoder, create_geocoder, get_census_block_geoid
 from .models import GeocodedAddress, LookupResult, ProviderResult
 from .scorer import EnsembleScorer, get_canonical_id
 from .spatial_index import SpatialIndex
@@ -29,6 +34,33 @@ from .hifld_api import HIFLDApiLookup
 logger = logging.getLogger(__name__)
 
 
+def _read_request_log(path: Path, limit: int) -> list:
+    """
+    The limit most recently requested distinct addresses in a request log.
+    Each line is a JSON object with an "address" field, a JSON string, or
+    plain address text. Returned oldest first.
+    """
+    addresses: OrderedDict = OrderedDict()
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                entry = line
+            address = entry.get("address") if isinstance(entry, dict) else entry
+            if not isinstance(address, str) or len(address.strip()) < 5:
+                continue
+            address = address.strip()
+            addresses.pop(address, None)
+            addresses[address] = None
+            if len(addresses) > limit:
+                addresses.popitem(last=False)
+    return list(addresses)
+
+
 class LookupEngine:
     """
     Utility provider lookup engine.
@@ -48,7 +80,15 @@ class LookupEngine:
         # Spatial index — use PostGIS if available, else in-memory geopandas
         postgis_url = os.environ.get("POSTGIS_URL", "")
         if postgis_url:
-            self.spatial = PostGISSpatialIndex(postgis_url)
+            self.spatial = PostGISSpatialIndex(
+                postgis_url,
+                cache_size=self.config.spatial_cache_size,
+                cache_precision=self.config.spatial_cache_precision,
+                pool_min=self.config.postgis_pool_min,
+                pool_max=self.config.postgis_pool_max,
+                statement_timeout_ms=self.config.postgis_statement_timeout_ms,
+                batch_size=self.config.postgis_batch_size,
+            )
             if not self.spatial.is_loaded:
                 logger.warning("PostGIS unavailable, falling back to in-memory spatial index")
                 self.spatial = SpatialIndex(self.config)
@@ -67,7 +107,10 @@ class LookupEngine:
 
         # Geocoder
         self.geocoder: Geocoder = create_geocoder(
-            self.config.geocoder_type, google_api_key=self.config.google_api_key
+            self.config.geocoder_type, google_api_key=self.config.google_api_key,
+            cache_db=self.config.geocode_cache_db,
+            cache_ttl_days=self.config.geocode_cache_ttl_days,
+            negative_ttl_days=self.config.geocode_cache_negative_ttl_days,
         )
 
         # Priority 0: User corrections (highest priority)
@@ -126,7 +169,27 @@ class LookupEngine:
                 logger.warning(f"Internet lookup init failed: {e}")
 
         # Cache
-        self.cache = LookupCache(self.config.cache_db, self.config.cache_ttl_days)
+        self.cache = LookupCache(
+            self.config.cache_db, self.config.cache_ttl_days,
+            memory_size=self.config.cache_memory_size,
+            payload_memory_size=self.config.cache_payload_memory_size,
+            flush_interval=self.config.cache_flush_interval,
+            stale_grace_days=self.config.cache_stale_grace_days,
+            max_entries=self.config.cache_max_entries,
+            max_bytes=self.config.cache_max_bytes,
+            maintenance_interval=self.config.cache_maintenance_interval,
+        )
+        # Data versions every cached result depends on, so entries built from
+        # an older canonical file or corrections set can be invalidated by tag
+        self._data_tags = (
+            f"canonical_providers:{self._file_version(self.config.canonical_file)}",
+            f"corrections:{self.corrections.version()}",
+        )
+        logger.info(f"Cache data tags: {', '.join(self._data_tags)}")
+        # Background refresh of stale cache entries (created on first use)
+        self._refresh_pool: Optional[ThreadPoolExecutor] = None
+        self._refreshing: set = set()
+        self._refresh_lock = threading.Lock()
 
         elapsed = time.time() - t0
         counts = self.spatial.layer_counts
@@ -136,12 +199,78 @@ class LookupEngine:
             f"cache={self.cache.size} entries"
         )
 
-    def lookup(self, address: str, use_cache: bool = True) -> LookupResult:
+    @staticmethod
+    def _file_version(path: Path) -> str:
+        """Short content hash of a data file ("missing" if absent)."""
+        try:
+            return hashlib.blake2b(Path(path).read_bytes(), digest_size=6).hexdigest()
+        except OSError:
+            return "missing"
+
+    def before_fork(self):
+        """
+        Quiesce background threads in a preloading master before workers fork.
+
+        The master only serves as a template for the workers: its cache writer,
+        cache maintenance and refresh threads are stopped (pending writes are
+        flushed) so it never writes to the databases alongside them. Each
+        worker starts its own in after_fork().
+        """
+        if self._refresh_pool is not None:
+            self._refresh_pool.shutdown(wait=True)  # in-flight refreshes still write to the cache
+            self._refresh_pool = None
+        self.cache.stop_background()
+
+    def after_fork(self):
+        """
+        Re-open process-bound handles in a forked worker.
+
+        Spatial layers, normalizer tables and catalogs are plain in-memory
+        structures shared copy-on-write with the parent. Database connections
+        (SQLite caches, PostGIS, FCC Postgres) must not be used across a fork.
+        """
+        self.cache.reset_after_fork()
+        self._refresh_pool = None  # the parent's worker threads don't exist here
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        if isinstance(self.geocoder, CachingGeocoder):
+            self.geocoder.reset_after_fork()
+        self.spatial.reset_after_fork()
+        self.state_gis.reset_after_fork()
+        if self.internet:
+            self.internet.reset_after_fork()
+
+    def _refresh_in_background(self, address: str):
+        """Queue a cache refresh for address unless one is already in flight."""
+        with self._refresh_lock:
+            if address in self._refreshing:
+                return
+            self._refreshing.add(address)
+            if self._refresh_pool is None:
+                self._refresh_pool = ThreadPoolExecutor(
+                    max_workers=self.config.cache_refresh_workers, thread_name_prefix="cache-refresh",
+                )
+        self._refresh_pool.submit(self._refresh, address)
+
+    def _refresh(self, address: str):
+        try:
+            self.lookup(address, refresh=True)
+        except Exception as e:
+            logger.warning(f"Background cache refresh failed for '{address}': {e}")
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(address)
+
+    def lookup(self, address: str, use_cache: bool = True, refresh: bool = False) -> LookupResult:
         """
         Look up utility providers for an address.
 
+        With refresh=True cached entries are ignored but the new result is
+        still cached. A stale entry (past its TTL, within the grace period) is
+        returned immediately and refreshed in the background.
+
         1. Check cache
-        2. Geocode address -> (lat, lon)
+        2. Geocode address -> (lat, lon), then check the location-level cache
         3. Spatial query for electric, gas, water
         4. Normalize + score each result
         5. Handle deregulated market logic
@@ -150,15 +279,17 @@ class LookupEngine:
         t0 = time.time()
 
         # 1. Cache check
-        if use_cache:
-            cached = self.cache.get(address)
+        if use_cache and not refresh:
+            cached, stale = self.cache.get_entry(address)
             if cached:
+                if stale:
+                    self._refresh_in_background(address)
                 cached.lookup_time_ms = int((time.time() - t0) * 1000)
-                logger.debug(f"Cache hit for '{address}' ({cached.lookup_time_ms}ms)")
+                logger.debug(f"Cache hit for '{address}'{' (stale)' if stale else ''} ({cached.lookup_time_ms}ms)")
                 return cached
 
         # 2. Geocode
-        geo = self.geocoder.geocode(address)
+        geo = self.geocoder.geocode(address, use_cache=use_cache)
         if not geo:
             result = LookupResult(
                 address=address,
@@ -195,11 +326,36 @@ class LookupEngine:
         # Extract county from geocoder result
         addr_county = geo.county or ""
 
+        # Location-level cache: another spelling of this address may already be
+        # cached. Skipped when an address-level correction could change the answer,
+        # and not read on refresh (the location entry is recomputed below).
+        loc_key = ""
+        if use_cache and not self.corrections.has_address_correction(address):
+            loc_key = self.cache.location_key(geo.lat, geo.lon, addr_state, addr_zip,
+                                              addr_city, addr_county, geo.block_geoid)
+        if loc_key and not refresh:
+            cached, loc_expires = self.cache.get_location_entry(loc_key)
+            if cached:
+                cached.address = address
+                cached.lat, cached.lon = geo.lat, geo.lon
+                cached.geocode_confidence = geo.confidence
+                cached.lookup_time_ms = int((time.time() - t0) * 1000)
+                # Same data, same expiry: the copy must not restart the TTL clock
+                self.cache.put(address, cached, result_tags(cached, addr_state, addr_zip, self._data_tags),
+                               expires_at=loc_expires)
+                logger.debug(f"Location cache hit for '{address}' ({cached.lookup_time_ms}ms)")
+                return cached
+
         _lkw = dict(zip_code=addr_zip, city=addr_city, county=addr_county, address=address)
-        electric = self._lookup_with_state_gis(geo.lat, geo.lon, addr_state, "electric", **_lkw)
-        gas = self._lookup_with_state_gis(geo.lat, geo.lon, addr_state, "gas", **_lkw)
+        # One spatial pass for all layers (one round trip on PostGIS)
+        _types = ("electric", "gas") if self._skip_water else ("electric", "gas", "water")
+        polygons = self.spatial.query_point_all(geo.lat, geo.lon, _types)
+        electric = self._lookup_with_state_gis(geo.lat, geo.lon, addr_state, "electric",
+                                               polygons=polygons["electric"], **_lkw)
+        gas = self._lookup_with_state_gis(geo.lat, geo.lon, addr_state, "gas",
+                                          polygons=polygons["gas"], **_lkw)
         water = self._lookup_with_state_gis(geo.lat, geo.lon, addr_state, "water",
-                                             **_lkw) if not self._skip_water else None
+                                            polygons=polygons["water"], **_lkw) if not self._skip_water else None
 
         # Sewer: inherits from water, checks sewer catalog
         sewer = self._lookup_sewer(
@@ -231,7 +387,9 @@ class LookupEngine:
 
         # 6. Cache (skip geocode failures — they're transient and may succeed on retry)
         if use_cache and result.lat != 0.0:
-            self.cache.put(address, result)
+            tags = result_tags(result, addr_state, addr_zip, self._data_tags)
+            self.cache.put(address, result, tags)
+            self.cache.put_location(loc_key, result, tags)
 
         logger.info(
             f"Lookup '{address}' -> "
@@ -242,6 +400,50 @@ class LookupEngine:
         )
         return result
 
+    def warm_start(self) -> dict:
+        """
+        Prefill caches before the engine takes traffic: the hot lookup-cache
+        keys saved at the last shutdown, then the recent addresses of
+        warm_replay_log, looked up normally so the geocode, State GIS and
+        spatial caches fill as well. Returns counts per source.
+        """
+        loaded = replayed = 0
+        if self.config.warm_snapshot_file:
+            loaded = self.cache.load_snapshot(self.config.warm_snapshot_file)
+        if self.config.warm_replay_log:
+            replayed = self.replay_request_log(self.config.warm_replay_log, self.config.warm_replay_limit)
+        return {"snapshot": loaded, "replayed": replayed}
+
+    def replay_request_log(self, path: Path, limit: int = 1000) -> int:
+        """Look up the last limit distinct addresses of a request log. Returns lookups completed."""
+        try:
+            addresses = _read_request_log(Path(path), limit)
+        except OSError as e:
+            logger.warning(f"Warm start: could not read request log {path}: {e}")
+            return 0
+        if not addresses:
+            return 0
+        t0 = time.time()
+        with ThreadPoolExecutor(max_workers=self.config.warm_replay_workers,
+                                thread_name_prefix="cache-warm") as pool:
+            done = sum(pool.map(self._warm_lookup, addresses))
+        logger.info(f"Warm start: replayed {done}/{len(addresses)} addresses from {path} "
+                    f"in {time.time() - t0:.1f}s")
+        return done
+
+    def _warm_lookup(self, address: str) -> bool:
+        try:
+            self.lookup(address)
+            return True
+        except Exception as e:
+            logger.debug(f"Warm start lookup failed for '{address}': {e}")
+            return False
+
+    def save_warm_snapshot(self):
+        """Save the hottest lookup-cache keys for warm_start() (call at shutdown)."""
+        if self.config.warm_snapshot_file:
+            self.cache.save_snapshot(self.config.warm_snapshot_file, self.config.warm_snapshot_size)
+
     def lookup_batch(self, addresses: list, use_cache: bool = True, delay_ms: int = 200) -> list:
         """
         Batch lookup with progress logging.
@@ -382,11 +584,15 @@ class LookupEngine:
                                zip_code: str = "",
                                city: str = "",
                                county: str = "",
-                               address: str = "") -> Optional[ProviderResult]:
+                               address: str = "",
+                               polygons: Optional[list] = None) -> Optional[ProviderResult]:
         """
         Multi-source lookup: collect candidates from all sources, deduplicate,
         return primary result with alternatives.
 
+        polygons: this type's spatial.query_point_all() result, if the caller
+        already ran it; otherwise the spatial index is queried here.
+
         Priority chain:
           0. User corrections (0.99)
           1. State GIS API (0.90-0.95)
@@ -491,7 +697,8 @@ class LookupEngine:
                                cg_result["confidence"])
 
         # Priority 3: HIFLD shapefile
-        hifld_result = self._lookup_type(lat, lon, utility_type, address_state=address_state)
+        hifld_result = self._lookup_type(lat, lon, utility_type, address_state=address_state,
+                                         polygons=polygons)
         if hifld_result:
             candidates.append(hifld_result)
 
@@ -690,9 +897,11 @@ class LookupEngine:
         return deduped
 
     def _lookup_type(self, lat: float, lon: float, utility_type: str,
-                     address_state: str = "") -> Optional[ProviderResult]:
-        """Run spatial query and resolve the best provider for a utility type."""
-        polygons = self.spatial.query_point(lat, lon, utility_type)
+                     address_state: str = "",
+                     polygons: Optional[list] = None) -> Optional[ProviderResult]:
+        """Run spatial query (unless polygons are given) and resolve the best provider for a utility type."""
+        if polygons is None:
+            polygons = self.spatial.query_point(lat, lon, utility_type)
         if not polygons:
             return None
 
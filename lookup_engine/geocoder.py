@@ -1,23 +1,35 @@
 """Geocoding wrapper — pluggable: Census (free) or Google (API key required)."""
 
 import csv
+import dataclasses
 import io
+import json
 import logging
+import sqlite3
 import time
 from abc import ABC, abstractmethod
+from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 import requests
 
+from .cache import SQLiteConnections, _normalize_address_key
 from .models import GeocodedAddress
 
 logger = logging.getLogger(__name__)
 
 
 class Geocoder(ABC):
+    def geocode(self, address: str, use_cache: bool = True) -> Optional[GeocodedAddress]:
+        """Geocode an address string to lat/lon + components (use_cache: see CachingGeocoder)."""
+        return self.geocode_status(address)[0]
+
     @abstractmethod
-    def geocode(self, address: str) -> Optional[GeocodedAddress]:
-        """Geocode an address string to lat/lon + components."""
+    def geocode_status(self, address: str) -> Tuple[Optional[GeocodedAddress], bool]:
+        """
+        (result, answered). answered is False when the request itself failed
+        (network, HTTP or parse error), so a None result is not a real no-match.
+        """
         ...
 
 
@@ -30,7 +42,7 @@ class CensusGeocoder(Geocoder):
     BATCH_TIMEOUT = 300  # 5 minutes per chunk
     BATCH_MAX_RETRIES = 3
 
-    def geocode(self, address: str) -> Optional[GeocodedAddress]:
+    def geocode_status(self, address: str) -> Tuple[Optional[GeocodedAddress], bool]:
         params = {
             "address": address,
             "benchmark": "Public_AR_Current",
@@ -47,7 +59,7 @@ class CensusGeocoder(Geocoder):
             matches = data.get("result", {}).get("addressMatches", [])
             if not matches:
                 logger.debug(f"Census geocoder: no match for '{address}' ({elapsed_ms}ms)")
-                return None
+                return None, True
 
             best = matches[0]
             coords = best.get("coordinates", {})
@@ -78,14 +90,14 @@ class CensusGeocoder(Geocoder):
                 block_geoid=block_geoid,
             )
             logger.debug(f"Census geocoder: {address} -> ({result.lat}, {result.lon}) ({elapsed_ms}ms)")
-            return result
+            return result, True
 
         except requests.RequestException as e:
             logger.error(f"Census geocoder error for '{address}': {e}")
-            return None
+            return None, False
         except (KeyError, ValueError, IndexError) as e:
             logger.error(f"Census geocoder parse error for '{address}': {e}")
-            return None
+            return None, False
 
     def geocode_batch(
         self, addresses: List[Tuple[str, str]], on_chunk_complete=None,
@@ -265,7 +277,7 @@ class GoogleGeocoder(Geocoder):
             raise ValueError("Google geocoder requires an API key")
         self.api_key = api_key
 
-    def geocode(self, address: str) -> Optional[GeocodedAddress]:
+    def geocode_status(self, address: str) -> Tuple[Optional[GeocodedAddress], bool]:
         params = {
             "address": address,
             "key": self.api_key,
@@ -281,7 +293,8 @@ class GoogleGeocoder(Geocoder):
             status = data.get("status", "UNKNOWN")
             if not results:
                 logger.warning(f"Google geocoder: no match for '{address}' (status={status}, {elapsed_ms}ms)")
-                return None
+                # ZERO_RESULTS is a real no-match; OVER_QUERY_LIMIT, REQUEST_DENIED etc. are failures
+                return None, status == "ZERO_RESULTS"
 
             best = results[0]
             loc = best.get("geometry", {}).get("location", {})
@@ -317,11 +330,11 @@ class GoogleGeocoder(Geocoder):
                 **components,
             )
             logger.debug(f"Google geocoder: {address} -> ({result.lat}, {result.lon}) ({elapsed_ms}ms)")
-            return result
+            return result, True
 
         except requests.RequestException as e:
             logger.error(f"Google geocoder error for '{address}': {e}")
-            return None
+            return None, False
 
 
 class NominatimGeocoder(Geocoder):
@@ -333,7 +346,7 @@ class NominatimGeocoder(Geocoder):
         self.email = email  # Nominatim requires contact email for heavy usage
         self._last_call = 0.0
 
-    def geocode(self, address: str) -> Optional[GeocodedAddress]:
+    def geocode_status(self, address: str) -> Tuple[Optional[GeocodedAddress], bool]:
         # Light rate limit — 0.25s between calls per worker instance
         elapsed = time.time() - self._last_call
         if elapsed < 0.25:
@@ -362,14 +375,14 @@ class NominatimGeocoder(Geocoder):
             elapsed_ms = (time.time() - t0) * 1000
 
             if not results:
-                return None
+                return None, True
 
             best = results[0]
             lat = float(best.get("lat", 0))
             lon = float(best.get("lon", 0))
 
             if lat == 0 and lon == 0:
-                return None
+                return None, True
 
             addr = best.get("address", {})
             city = addr.get("city", "") or addr.get("town", "") or addr.get("village", "")
@@ -394,11 +407,11 @@ class NominatimGeocoder(Geocoder):
                 block_geoid="",  # Nominatim doesn't provide Census blocks
             )
             logger.debug(f"Nominatim geocoder: {address} -> ({lat}, {lon}) ({elapsed_ms:.0f}ms)")
-            return result
+            return result, True
 
         except requests.RequestException as e:
             logger.debug(f"Nominatim geocoder error for '{address}': {e}")
-            return None
+            return None, False
 
 
 class ChainedGeocoder(Geocoder):
@@ -411,21 +424,22 @@ class ChainedGeocoder(Geocoder):
         self.fallback_hits = 0
         self.total_misses = 0
 
-    def geocode(self, address: str) -> Optional[GeocodedAddress]:
-        result = self.primary.geocode(address)
+    def geocode_status(self, address: str) -> Tuple[Optional[GeocodedAddress], bool]:
+        result, primary_answered = self.primary.geocode_status(address)
         if result is not None:
             self.primary_hits += 1
-            return result
+            return result, True
         # Primary failed, try fallback
         logger.info(f"Census miss, trying Google fallback: '{address[:60]}'")
-        result = self.fallback.geocode(address)
+        result, fallback_answered = self.fallback.geocode_status(address)
         if result is not None:
             self.fallback_hits += 1
             logger.info(f"Google fallback matched: '{address[:60]}' -> ({result.lat}, {result.lon})")
-            return result
+            return result, True
         self.total_misses += 1
         logger.info(f"Both Census and Google failed for: '{address[:60]}'")
-        return None
+        # A real no-match only if neither request errored
+        return None, primary_answered and fallback_answered
 
     @property
     def stats(self) -> dict:
@@ -440,18 +454,134 @@ class ChainedGeocoder(Geocoder):
         }
 
 
-def create_geocoder(geocoder_type: str = "census", google_api_key: str = "") -> Geocoder:
+class CachingGeocoder(Geocoder):
+    """
+    Persistent SQLite cache in front of another geocoder.
+
+    Stores the full GeocodedAddress (county and block_geoid included) keyed by
+    the normalized address, for ttl_days. No-matches are cached too, for
+    negative_ttl_days, so an address the geocoders cannot match is not re-sent
+    on every run; failed requests (geocode_status answered=False) are never
+    cached. The database file can be shared by the API, CLI and batch tools.
+    """
+
+    def __init__(self, inner: Geocoder, db_path: Path, ttl_days: float = 180,
+                 negative_ttl_days: float = 1, busy_timeout_ms: int = 5000):
+        self.inner = inner
+        self.ttl_days = ttl_days
+        self.negative_ttl_days = negative_ttl_days
+        self.hits = 0
+        self.misses = 0
+        self._db = SQLiteConnections(db_path, busy_timeout_ms)
+        with self._db.get() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS geocode_cache (
+                    address_key TEXT PRIMARY KEY,
+                    result_json TEXT,  -- NULL: cached miss
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    def geocode(self, address: str, use_cache: bool = True) -> Optional[GeocodedAddress]:
+        """With use_cache=False the cache is not read, but the fresh answer is still stored."""
+        return self._geocode(address, use_cache)[0]
+
+    def geocode_status(self, address: str) -> Tuple[Optional[GeocodedAddress], bool]:
+        return self._geocode(address, True)
+
+    def _geocode(self, address: str, use_cache: bool) -> Tuple[Optional[GeocodedAddress], bool]:
+        if use_cache:
+            found, result = self.cached(address)
+            if found:
+                self.hits += 1
+                return result, True
+        self.misses += 1
+        result, answered = self.inner.geocode_status(address)
+        if answered:
+            self.store(address, result)
+        return result, answered
+
+    def cached(self, address: str) -> Tuple[bool, Optional[GeocodedAddress]]:
+        """(True, result-or-None) if address has an unexpired entry (None = cached miss), else (False, None)."""
+        key = _normalize_address_key(address)
+        if not key:
+            return False, None
+        try:
+            row = self._db.get().execute(
+                "SELECT result_json FROM geocode_cache WHERE address_key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Geocode cache read error: {e}")
+            return False, None
+        if row is None:
+            return False, None
+        if row[0] is None:
+            return True, None
+        try:
+            return True, GeocodedAddress(**json.loads(row[0]))
+        except (json.JSONDecodeError, TypeError):
+            return False, None
+
+    def store(self, address: str, result: Optional[GeocodedAddress]):
+        """Cache a geocode result (None caches a miss)."""
+        key = _normalize_address_key(address)
+        if not key:
+            return
+        now = time.time()
+        ttl = self.ttl_days if result is not None else self.negative_ttl_days
+        result_json = json.dumps(dataclasses.asdict(result)) if result is not None else None
+        try:
+            with self._db.get() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO geocode_cache (address_key, result_json, created_at, expires_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, result_json, now, now + ttl * 86400),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Geocode cache write error: {e}")
+
+    @property
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        stats = {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_hit_rate": f"{self.hits / total * 100:.1f}%" if total else "N/A",
+        }
+        inner_stats = getattr(self.inner, "stats", None)
+        if isinstance(inner_stats, dict):
+            stats.update(inner_stats)
+        return stats
+
+    def close(self):
+        self._db.close_all()
+
+    def reset_after_fork(self):
+        self._db.reset_after_fork()
+
+
+def create_geocoder(geocoder_type: str = "census", google_api_key: str = "",
+                    cache_db: Optional[Path] = None, cache_ttl_days: float = 180,
+                    negative_ttl_days: float = 1) -> Geocoder:
     """Factory function to create a geocoder instance.
 
     Args:
         geocoder_type: "census" (default, free), "google", or "chained" (Census + Google fallback)
         google_api_key: Required for "google" and "chained" types
+        cache_db: If set, wrap the geocoder in a CachingGeocoder backed by this SQLite file
+        cache_ttl_days / negative_ttl_days: CachingGeocoder TTLs for matches / misses
     """
     if geocoder_type == "chained" and google_api_key:
-        return ChainedGeocoder(CensusGeocoder(), GoogleGeocoder(google_api_key))
+        geocoder = ChainedGeocoder(CensusGeocoder(), GoogleGeocoder(google_api_key))
     elif geocoder_type == "google" and google_api_key:
-        return GoogleGeocoder(google_api_key)
-    return CensusGeocoder()
+        geocoder = GoogleGeocoder(google_api_key)
+    else:
+        geocoder = CensusGeocoder()
+    if cache_db:
+        geocoder = CachingGeocoder(geocoder, cache_db, cache_ttl_days, negative_ttl_days)
+    return geocoder
 
 
 def get_census_block_geoid(lat: float, lon: float) -> Optional[str]:
@@ -34,6 +34,7 @@ class InternetLookup:
     def __init__(self, db_url: str):
         self.db_url = db_url
         self.conn = None
+        self._orphaned: list = []  # connections inherited across fork; never closed here
         self._available = False
         try:
             self._get_conn()
@@ -113,6 +114,15 @@ class InternetLookup:
         if self.conn and not self.conn.closed:
             self.conn.close()
 
+    def reset_after_fork(self):
+        """
+        Retire the connection inherited from the parent; reconnect on next query.
+        It stays referenced rather than closed, see PostGISSpatialIndex.reset_after_fork.
+        """
+        if self.conn is not None:
+            self._orphaned.append(self.conn)
+        self.conn = None
+
     @property
     def loaded(self) -> bool:
         return self._available
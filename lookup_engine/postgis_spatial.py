@@ -5,53 +5,129 @@ geopandas DataFrames. Provides instant startup since no shapefiles need loading.
 """
 
 import logging
+import math
 import os
+import threading
+from contextlib import contextmanager
 from typing import Optional
 
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
 import psycopg2.extras
+import psycopg2.pool
+
+from .cache import SpatialCellCache
 
 logger = logging.getLogger(__name__)
 
-# SQL template for point-in-polygon query, sorted by area ascending (smallest first)
-_QUERY_ELECTRIC = """
-    SELECT name, state, type, holding_co, cntrl_area, customers, eia_id, area_km2
-    FROM electric_territories
-    WHERE ST_Contains(geometry, ST_SetSRID(ST_MakePoint(%s, %s), 4326))
-    ORDER BY area_km2 ASC
-"""
+# Per layer: table and attribute columns. Attributes are returned as jsonb so
+# layers with different columns/types can share one UNION ALL result shape.
+_LAYER_TABLES = {
+    "electric": ("electric_territories",
+                 ("name", "state", "type", "holding_co", "cntrl_area", "customers", "eia_id")),
+    "gas": ("gas_territories", ("name", "state", "type", "holding_co", "customers", "eia_id")),
+    "water": ("water_territories", ("name", "state", "pwsid", "population_served")),
+}
 
-_QUERY_GAS = """
-    SELECT name, state, type, holding_co, customers, eia_id, area_km2
-    FROM gas_territories
-    WHERE ST_Contains(geometry, ST_SetSRID(ST_MakePoint(%s, %s), 4326))
-    ORDER BY area_km2 ASC
-"""
+_POINT_SQL = "ST_SetSRID(ST_MakePoint(%(lon)s, %(lat)s), 4326)"  # PostGIS uses (x=lon, y=lat)
+_CELL_SQL = "ST_MakeEnvelope(%(minx)s, %(miny)s, %(maxx)s, %(maxy)s, 4326)"
+
+
+def _point_filter(utility_type: str, subdivided: bool, point_sql: str = _POINT_SQL) -> str:
+    """
+    WHERE clause for polygons containing a point. On a subdivided layer the
+    point is tested against the small <table>_sub pieces and matched back to
+    distinct parent rows; ST_Intersects so points on internal cut lines match.
+    """
+    table, _ = _LAYER_TABLES[utility_type]
+    if subdivided:
+        return f"gid IN (SELECT parent_id FROM {table}_sub WHERE ST_Intersects(geometry, {point_sql}))"
+    return f"ST_Contains(geometry, {point_sql})"
 
-_QUERY_WATER = """
-    SELECT name, state, pwsid, population_served, area_km2
-    FROM water_territories
-    WHERE ST_Contains(geometry, ST_SetSRID(ST_MakePoint(%s, %s), 4326))
-    ORDER BY area_km2 ASC
-"""
+
+def _layer_query(utility_type: str, with_cell: bool, subdivided: bool = False) -> str:
+    """
+    One UNION ALL branch for a layer: polygons containing the point. With
+    with_cell it returns every polygon touching the cache cell instead, flagged
+    with whether it contains the point (hit) and the whole cell (cell_inside).
+    """
+    table, columns = _LAYER_TABLES[utility_type]
+    attrs = ", ".join(f"'{c}', t.{c}" for c in columns + ("area_km2",))
+    select = f"SELECT '{utility_type}' AS layer, t.area_km2, jsonb_build_object({attrs}) AS attrs"
+    if with_cell and subdivided:
+        # A cell counts as inside only if one piece holds all of it (conservative)
+        return (f"{select}, s.hit, s.cell_inside FROM {table} t JOIN ("
+                f"SELECT parent_id, bool_or(ST_Intersects(geometry, {_POINT_SQL})) AS hit, "
+                f"bool_or(ST_ContainsProperly(geometry, {_CELL_SQL})) AS cell_inside "
+                f"FROM {table}_sub WHERE ST_Intersects(geometry, {_CELL_SQL}) GROUP BY parent_id"
+                f") s ON t.gid = s.parent_id")
+    if with_cell:
+        return (f"{select}, ST_Contains(geometry, {_POINT_SQL}) AS hit, "
+                f"ST_ContainsProperly(geometry, {_CELL_SQL}) AS cell_inside "
+                f"FROM {table} t WHERE ST_Intersects(geometry, {_CELL_SQL})")
+    return (f"{select}, TRUE AS hit, FALSE AS cell_inside "
+            f"FROM {table} t WHERE {_point_filter(utility_type, subdivided)}")
+
+
+def _batch_layer_query(utility_type: str, subdivided: bool = False) -> str:
+    """
+    One UNION ALL branch of the bulk query: every (input index, polygon) pair
+    where the polygon contains that input point. Expects the pts CTE.
+    """
+    table, columns = _LAYER_TABLES[utility_type]
+    columns = columns + ("area_km2",)
+    attrs = ", ".join(f"'{c}', t.{c}" for c in columns)
+    point_sql = "ST_SetSRID(ST_MakePoint(p.lon, p.lat), 4326)"
+    return (f"SELECT p.idx, '{utility_type}' AS layer, t.area_km2, jsonb_build_object({attrs}) AS attrs "
+            f"FROM pts p CROSS JOIN LATERAL ("
+            f"SELECT {', '.join(columns)} FROM {table} "
+            f"WHERE {_point_filter(utility_type, subdivided, point_sql)}) t")
+
+
+_BATCH_PTS_SQL = ("WITH pts AS (SELECT * FROM unnest(%(idx)s::int[], %(lon)s::float8[], %(lat)s::float8[]) "
+                  "AS p(idx, lon, lat)) ")
 
 
 class PostGISSpatialIndex:
-    """PostGIS-backed spatial index. Same interface as SpatialIndex."""
+    """
+    PostGIS-backed spatial index. Same interface as SpatialIndex.
+
+    Queries run on a thread-safe connection pool so concurrent API requests and
+    batch_validate.py worker threads each get their own connection. Callers
+    beyond pool_max wait for a free connection instead of failing. Every
+    connection carries a server-side statement_timeout.
+    """
 
-    def __init__(self, db_url: str):
+    def __init__(self, db_url: str, cache_size: int = 0, cache_precision: int = 4,
+                 pool_min: int = 1, pool_max: int = 8, statement_timeout_ms: int = 5000,
+                 batch_size: int = 500):
         self._db_url = db_url
-        self._conn = None
+        self._batch_size = max(batch_size, 1)
+        self._pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+        self._pool_min = pool_min
+        self._pool_max = max(pool_max, pool_min, 1)
+        self._statement_timeout_ms = statement_timeout_ms
+        # psycopg2 pools raise when exhausted; the semaphore makes callers wait
+        self._slots = threading.BoundedSemaphore(self._pool_max)
+        self._pool_lock = threading.Lock()
+        self._orphaned: list = []  # pools inherited across fork; never closed or finalized here
         self._available = False
         self._table_counts = {"electric": 0, "gas": 0, "water": 0}
+        self._subdivided = {"electric": False, "gas": False, "water": False}
+        self.cache = SpatialCellCache(cache_size, cache_precision)
         self._connect()
 
     def _connect(self):
         try:
-            self._conn = psycopg2.connect(self._db_url)
-            self._conn.autocommit = True
+            with self._pool_lock:
+                if self._pool is None or self._pool.closed:
+                    self._pool = psycopg2.pool.ThreadedConnectionPool(
+                        self._pool_min, self._pool_max, self._db_url,
+                        options=f"-c statement_timeout={int(self._statement_timeout_ms)}",
+                    )
             # Verify tables exist and get counts
-            with self._conn.cursor() as cur:
+            with self._connection() as conn, conn.cursor() as cur:
                 for table, utype in [
                     ("electric_territories", "electric"),
                     ("gas_territories", "gas"),
@@ -61,15 +137,17 @@ class PostGISSpatialIndex:
                         cur.execute(f"SELECT COUNT(*) FROM {table}")
                         self._table_counts[utype] = cur.fetchone()[0]
                     except psycopg2.Error:
-                        self._conn.rollback()
                         self._table_counts[utype] = 0
+                self._detect_subdivided(cur)
 
             total = sum(self._table_counts.values())
             if total > 0:
                 self._available = True
                 logger.info(
                     f"PostGIS spatial index: electric={self._table_counts['electric']}, "
-                    f"gas={self._table_counts['gas']}, water={self._table_counts['water']}"
+                    f"gas={self._table_counts['gas']}, water={self._table_counts['water']} "
+                    f"(pool {self._pool_min}-{self._pool_max}, "
+                    f"subdivided: {', '.join(u for u, sub in self._subdivided.items() if sub) or 'none'})"
                 )
             else:
                 logger.warning("PostGIS spatial tables are empty")
@@ -77,49 +155,190 @@ class PostGISSpatialIndex:
             logger.warning(f"PostGIS spatial index unavailable: {e}")
             self._available = False
 
+    def _detect_subdivided(self, cur) -> bool:
+        """
+        Look up which layers have an ST_Subdivide companion table (from
+        import_shapefiles_to_postgis.py --subdivide). Returns True if that changed.
+        """
+        found = {}
+        for utype, (table, _) in _LAYER_TABLES.items():
+            cur.execute("SELECT to_regclass(%s) IS NOT NULL", (f"{table}_sub",))
+            found[utype] = bool(cur.fetchone()[0])
+        changed = found != self._subdivided
+        self._subdivided = found
+        return changed
+
+    def _fetch(self, build_query, params: dict) -> list:
+        """
+        Run the query build_query() makes from the current table layout. If a
+        table it names is gone (a re-import swapped the layers and dropped or
+        added _sub tables), the layout is re-detected and the query rebuilt
+        and retried once, so a running API follows the swap.
+        """
+        try:
+            with self._connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                cur.execute(build_query(), params)
+                return cur.fetchall()
+        except psycopg2.errors.UndefinedTable:
+            with self._connection() as conn, conn.cursor() as cur:
+                if not self._detect_subdivided(cur):
+                    raise
+            logger.info(f"PostGIS layers changed; subdivided now: "
+                        f"{', '.join(u for u, sub in self._subdivided.items() if sub) or 'none'}")
+            with self._connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                cur.execute(build_query(), params)
+                return cur.fetchall()
+
     def _ensure_connection(self):
-        """Reconnect if connection was lost."""
-        if self._conn is None or self._conn.closed:
+        """Recreate the pool if it was closed or never came up."""
+        if self._pool is None or self._pool.closed:
             self._connect()
 
+    @contextmanager
+    def _connection(self):
+        """
+        Check a healthy autocommit connection out of the pool.
+
+        Connections that are closed or in an unknown state are discarded on
+        checkout; connections that fail with a connection-level error are
+        discarded on return. Query errors (including statement timeouts) leave
+        the connection in the pool.
+        """
+        timeout = max(self._statement_timeout_ms / 1000, 1.0)
+        if not self._slots.acquire(timeout=timeout):
+            raise psycopg2.pool.PoolError(f"no PostGIS connection free after {timeout:.0f}s")
+        try:
+            pool = self._pool
+            conn = pool.getconn()
+            while conn.closed or conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+            conn.autocommit = True
+            broken = False
+            try:
+                yield conn
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                broken = True
+                raise
+            finally:
+                pool.putconn(conn, close=broken or bool(conn.closed))
+        finally:
+            self._slots.release()
+
     def query_point(self, lat: float, lon: float, utility_type: str) -> list[dict]:
         """
         Find all polygons containing the point, sorted by area ascending.
         Returns same format as SpatialIndex.query_point().
         """
-        if not self._available:
-            return []
+        return self.query_point_all(lat, lon, (utility_type,)).get(utility_type, [])
 
-        self._ensure_connection()
+    def query_point_all(self, lat: float, lon: float,
+                        types: tuple = ("electric", "gas", "water")) -> dict:
+        """
+        query_point() for several utility types in a single round trip.
+        Returns {utility_type: list of dicts sorted smallest-first}.
+
+        Types answered by the quantized-coordinate cache are not queried. When
+        the cache asks for a cell to be proven, that layer is queried against
+        the whole cell so it can be cached if one polygon set covers it.
+        """
+        results = {utype: [] for utype in types}
+        if not self._available:
+            return results
 
-        query_map = {
-            "electric": _QUERY_ELECTRIC,
-            "gas": _QUERY_GAS,
-            "water": _QUERY_WATER,
-        }
+        cell = self.cache.cell(lat, lon)
+        pending, proving = [], set()
+        for utype in types:
+            if utype not in _LAYER_TABLES:
+                continue
+            cached, prove = self.cache.lookup(utype, cell) if cell is not None else (None, False)
+            if cached is not None:
+                results[utype] = cached
+                continue
+            pending.append(utype)
+            if prove:
+                proving.add(utype)
+        if not pending:
+            return results
 
-        query = query_map.get(utility_type)
-        if not query:
-            return []
+        self._ensure_connection()
+        if self._pool is None:
+            return results
 
+        params = {"lon": lon, "lat": lat}
+        if proving:
+            params.update(zip(("minx", "miny", "maxx", "maxy"), self.cache.bounds(cell)))
+        def build_query():
+            return (" UNION ALL ".join(_layer_query(utype, utype in proving, self._subdivided[utype])
+                                       for utype in pending)
+                    + " ORDER BY layer, area_km2 ASC")
         try:
-            with self._conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-                cur.execute(query, (lon, lat))  # PostGIS uses (x=lon, y=lat)
-                rows = cur.fetchall()
+            rows = self._fetch(build_query, params)
         except psycopg2.Error as e:
             logger.warning(f"PostGIS query error: {e}")
-            self._conn = None  # Force reconnect next time
-            return []
+            return results
 
-        results = []
+        uniform = dict.fromkeys(proving, True)
         for row in rows:
-            attrs = self._row_to_attrs(dict(row), utility_type)
-            results.append(attrs)
+            if row["layer"] in uniform:
+                uniform[row["layer"]] = uniform[row["layer"]] and bool(row["cell_inside"])
+            if row["hit"]:
+                results[row["layer"]].append(self._row_to_attrs(row["attrs"], row["layer"]))
+        for utype, is_uniform in uniform.items():
+            self.cache.store(utype, cell, results[utype] if is_uniform else None)
+        return results
+
+    def query_points(self, lats, lons, utility_type: str) -> list[list[dict]]:
+        """
+        Query many points at once. Same return format as SpatialIndex.query_points():
+        one area-ascending list per input point, in input order.
+        """
+        return self.query_points_all(lats, lons, (utility_type,)).get(utility_type, [[] for _ in lats])
 
+    def query_points_all(self, lats, lons,
+                         types: tuple = ("electric", "gas", "water")) -> dict:
+        """
+        Bulk query_point_all(): sends the points as unnest()ed lon/lat arrays
+        joined LATERAL against each layer table, batch_size points per
+        statement, instead of one round trip per point. Bulk queries skip the
+        quantized-coordinate cache. Non-finite coordinates match nothing.
+
+        Returns:
+            {utility_type: one list per input point (input order), each sorted
+            smallest-first exactly like query_point()}.
+        """
+        lats, lons = list(lats), list(lons)
+        if len(lats) != len(lons):
+            raise ValueError(f"lats and lons differ in length: {len(lats)} vs {len(lons)}")
+        results = {utype: [[] for _ in lats] for utype in types}
+        layers = [utype for utype in types if utype in _LAYER_TABLES]
+        if not self._available or not layers or not lats:
+            return results
+
+        self._ensure_connection()
+        if self._pool is None:
+            return results
+
+        points = [(i, float(lon), float(lat)) for i, (lat, lon) in enumerate(zip(lats, lons))
+                  if math.isfinite(lat) and math.isfinite(lon)]
+        def build_query():
+            return (_BATCH_PTS_SQL
+                    + " UNION ALL ".join(_batch_layer_query(utype, self._subdivided[utype]) for utype in layers)
+                    + " ORDER BY idx, layer, area_km2 ASC")
+        for start in range(0, len(points), self._batch_size):
+            chunk = points[start:start + self._batch_size]
+            idx, chunk_lons, chunk_lats = (list(col) for col in zip(*chunk))
+            try:
+                rows = self._fetch(build_query, {"idx": idx, "lon": chunk_lons, "lat": chunk_lats})
+            except psycopg2.Error as e:
+                logger.warning(f"PostGIS batch query error ({len(chunk)} points): {e}")
+                continue
+            for row in rows:
+                results[row["layer"]][row["idx"]].append(self._row_to_attrs(row["attrs"], row["layer"]))
         return results
 
     def _row_to_attrs(self, row: dict, utility_type: str) -> dict:
-        """Convert a PostGIS row to the same dict format as SpatialIndex._extract_attributes."""
+        """Convert a PostGIS row to the same dict format as SpatialIndex.query_point()."""
         base = {"area_km2": row.get("area_km2", 0)}
 
         if utility_type == "electric":
@@ -166,3 +385,21 @@ class PostGISSpatialIndex:
     def load_all(self):
         """No-op — PostGIS tables are always available. Matches SpatialIndex interface."""
         pass
+
+    def reset_after_fork(self):
+        """
+        Retire the pool inherited from the parent and rebuild on next query.
+
+        Closing its connections (including implicitly, when they are garbage
+        collected) would send libpq's Terminate over sockets the parent still
+        uses, so the pool stays referenced in _orphaned instead.
+        """
+        if self._pool is not None:
+            self._orphaned.append(self._pool)
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(self._pool_max)
+        self._pool_lock = threading.Lock()
+
+    def close(self):
+        if self._pool is not None and not self._pool.closed:
+            self._pool.closeall()
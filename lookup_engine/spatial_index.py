@@ -1,27 +1,524 @@
 """Spatial index for point-in-polygon utility territory lookups."""
 
+import json
 import logging
+import math
+import os
+import threading
 import time
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 
 import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pyogrio
+import shapely
 from shapely.geometry import Point
 from shapely.validation import make_valid
 
+from .cache import SpatialCellCache
 from .config import Config
 
 logger = logging.getLogger(__name__)
 
+# Polygon attributes returned by query_point: output key -> (source column, default)
+_ATTRIBUTE_FIELDS = {
+    "electric": {
+        "name": ("NAME", ""),
+        "state": ("STATE", ""),
+        "type": ("TYPE", ""),
+        "holding_co": ("HOLDING_CO", ""),
+        "cntrl_area": ("CNTRL_AREA", ""),
+        "customers": ("CUSTOMERS", 0),
+        "eia_id": ("ID", ""),
+    },
+    "gas": {
+        "name": ("NAME", ""),
+        "state": ("STATE", ""),
+        "type": ("TYPE", ""),
+        "holding_co": ("HOLDINGCO", ""),
+        "customers": ("TOTAL_CUST", 0),
+        "eia_id": ("SVCTERID", ""),
+    },
+    "water": {
+        "name": ("PWS_Name", ""),
+        "state": ("Primacy_Agency", ""),
+        "pwsid": ("PWSID", ""),
+        "population_served": ("Population_Served_Count", 0),
+    },
+}
+
+# Attributes that are the same for every polygon in a layer
+_CONSTANT_FIELDS = {
+    "electric": {"source": "HIFLD Electric Retail Service Territories"},
+    "gas": {"source": "HIFLD Natural Gas Service Territories"},
+    "water": {"type": "WATER", "source": "EPA CWS Boundaries"},
+}
+
+
+# Approximate lon/lat bounds (minx, miny, maxx, maxy) per state, used to pick
+# which tiles to preload when layers are partitioned (Config.spatial_preload_states)
+_STATE_BOUNDS = {
+    "AL": (-88.5, 30.2, -84.9, 35.0), "AK": (-179.2, 51.2, -129.9, 71.4),
+    "AZ": (-114.9, 31.3, -109.0, 37.0), "AR": (-94.7, 33.0, -89.6, 36.5),
+    "CA": (-124.5, 32.5, -114.1, 42.0), "CO": (-109.1, 37.0, -102.0, 41.0),
+    "CT": (-73.8, 41.0, -71.8, 42.1), "DE": (-75.8, 38.4, -75.0, 39.9),
+    "DC": (-77.2, 38.8, -76.9, 39.0), "FL": (-87.7, 24.5, -80.0, 31.0),
+    "GA": (-85.7, 30.3, -80.8, 35.0), "HI": (-160.3, 18.9, -154.8, 22.3),
+    "ID": (-117.3, 42.0, -111.0, 49.0), "IL": (-91.6, 36.9, -87.0, 42.6),
+    "IN": (-88.1, 37.7, -84.8, 41.8), "IA": (-96.7, 40.4, -90.1, 43.5),
+    "KS": (-102.1, 37.0, -94.6, 40.0), "KY": (-89.6, 36.5, -81.9, 39.2),
+    "LA": (-94.1, 28.9, -88.8, 33.1), "ME": (-71.1, 43.0, -66.9, 47.5),
+    "MD": (-79.5, 37.9, -75.0, 39.8), "MA": (-73.6, 41.2, -69.9, 42.9),
+    "MI": (-90.5, 41.7, -82.4, 48.3), "MN": (-97.3, 43.5, -89.5, 49.4),
+    "MS": (-91.7, 30.1, -88.1, 35.0), "MO": (-95.8, 36.0, -89.1, 40.7),
+    "MT": (-116.1, 44.3, -104.0, 49.0), "NE": (-104.1, 40.0, -95.3, 43.0),
+    "NV": (-120.1, 35.0, -114.0, 42.0), "NH": (-72.6, 42.7, -70.6, 45.4),
+    "NJ": (-75.6, 38.9, -73.9, 41.4), "NM": (-109.1, 31.3, -103.0, 37.0),
+    "NY": (-79.8, 40.5, -71.8, 45.1), "NC": (-84.4, 33.8, -75.4, 36.6),
+    "ND": (-104.1, 45.9, -96.5, 49.0), "OH": (-84.9, 38.4, -80.5, 42.0),
+    "OK": (-103.1, 33.6, -94.4, 37.0), "OR": (-124.6, 41.9, -116.4, 46.3),
+    "PA": (-80.6, 39.7, -74.7, 42.3), "RI": (-71.9, 41.1, -71.1, 42.1),
+    "SC": (-83.4, 32.0, -78.5, 35.3), "SD": (-104.1, 42.4, -96.4, 46.0),
+    "TN": (-90.4, 34.9, -81.6, 36.7), "TX": (-106.7, 25.8, -93.5, 36.5),
+    "UT": (-114.1, 37.0, -109.0, 42.0), "VT": (-73.5, 42.7, -71.4, 45.1),
+    "VA": (-83.7, 36.5, -75.2, 39.5), "WA": (-124.9, 45.5, -116.9, 49.0),
+    "WV": (-82.7, 37.2, -77.7, 40.7), "WI": (-92.9, 42.4, -86.2, 47.1),
+    "WY": (-111.1, 41.0, -104.0, 45.0), "PR": (-68.0, 17.8, -65.2, 18.6),
+}
+
+
+# Recursion limit for _split_polygon (2^12 pieces at most per polygon part)
+_SUBDIVIDE_MAX_DEPTH = 12
+
+
+def _split_polygon(geom, max_vertices: int, depth: int = 0) -> list:
+    """Polygon parts of geom, halving each part's bbox until it has few enough vertices."""
+    pieces = []
+    for part in shapely.get_parts(geom):
+        # Cut lines and make_valid leftovers can yield lines/points — drop them
+        if part.geom_type != "Polygon" or part.is_empty:
+            continue
+        if shapely.get_num_coordinates(part) <= max_vertices or depth >= _SUBDIVIDE_MAX_DEPTH:
+            pieces.append(part)
+            continue
+        minx, miny, maxx, maxy = part.bounds
+        if maxx - minx >= maxy - miny:
+            mid = (minx + maxx) / 2
+            halves = (shapely.box(minx, miny, mid, maxy), shapely.box(mid, miny, maxx, maxy))
+        else:
+            mid = (miny + maxy) / 2
+            halves = (shapely.box(minx, miny, maxx, mid), shapely.box(minx, mid, maxx, maxy))
+        for half in halves:
+            pieces.extend(_split_polygon(shapely.intersection(part, half), max_vertices, depth + 1))
+    return pieces
+
+
+def _subdivide(geometries: np.ndarray, max_vertices: int, clip=None) -> tuple:
+    """
+    Split polygons with more than max_vertices vertices into grid-bounded pieces.
+
+    Returns (pieces, parent index per piece) for the polygons that were split;
+    polygons under the limit (or that fail to split) are not included. With a
+    clip box, large polygons are cut down to it first — enough for a tile,
+    whose points all lie inside the box.
+    """
+    if max_vertices <= 0 or not len(geometries):
+        return np.empty(0, dtype=object), np.empty(0, dtype="int64")
+    pieces, parents = [], []
+    for idx in np.flatnonzero(shapely.get_num_coordinates(geometries) > max_vertices).tolist():
+        try:
+            geom = geometries[idx] if clip is None else shapely.intersection(geometries[idx], clip)
+            parts = _split_polygon(geom, max_vertices)
+        except shapely.errors.GEOSException as e:
+            logger.warning(f"Could not subdivide geometry {idx}, keeping it whole: {e}")
+            continue
+        if not parts:
+            continue
+        pieces += parts
+        parents += [idx] * len(parts)
+    arr = np.empty(len(pieces), dtype=object)
+    arr[:] = pieces
+    return arr, np.asarray(parents, dtype="int64")
+
+
+def _merge_pieces(geometries: np.ndarray, split_pieces: np.ndarray, split_parent: np.ndarray) -> tuple:
+    """
+    Search pieces for a layer: every polygon that was not split, as itself,
+    plus the pieces of the split ones. Returns (pieces, parent, cut flag).
+    """
+    whole = np.ones(len(geometries), dtype=bool)
+    whole[split_parent] = False
+    keep = np.flatnonzero(whole)
+    return (
+        np.concatenate([geometries[keep], split_pieces]),
+        np.concatenate([keep, split_parent]).astype("int64"),
+        np.concatenate([np.zeros(len(keep), dtype=bool), np.ones(len(split_pieces), dtype=bool)]),
+    )
+
+
+class _Layer:
+    """One loaded territory layer: geometries, STRtree and columnar attributes.
+
+    Attributes are kept as plain Python lists indexed by polygon position, so a
+    hit is a list lookup and a small dict build instead of a pandas row.
+
+    The tree is built over search pieces rather than whole polygons: with
+    subdivide_vertices > 0, polygons above that vertex count are cut into
+    grid-bounded pieces (piece_parent maps each back to its polygon), so huge
+    territories no longer match every point inside their bounding box and each
+    containment test touches only a few hundred vertices. Pieces of a split
+    polygon are tested with covers() so points on an internal cut line match.
+    """
+
+    def __init__(self, gdf: gpd.GeoDataFrame, utility_type: str, subdivide_vertices: int = 0,
+                 split: Optional[tuple] = None):
+        self.utility_type = utility_type
+        self.geometries = np.asarray(gdf.geometry.values)
+        self.area = gdf["_area_km2"].to_numpy(dtype="float64")
+        self.columns = {
+            key: gdf[col].tolist() if col in gdf.columns else [default] * len(gdf)
+            for key, (col, default) in _ATTRIBUTE_FIELDS[utility_type].items()
+        }
+        self._area_values = self.area.tolist()
+        self._constants = _CONSTANT_FIELDS[utility_type]
+        # split: precomputed (pieces, parent) from the snapshot, else cut now
+        if split is None:
+            split = _subdivide(self.geometries, subdivide_vertices)
+        self.pieces, self.piece_parent, self.piece_cut = _merge_pieces(self.geometries, *split)
+        self.tree = shapely.STRtree(self.pieces)
+        self.cells: Optional[_CellIndex] = None
+
+    def __len__(self) -> int:
+        return len(self.geometries)
+
+    def attributes(self, idx: int) -> dict:
+        """Attribute dict for polygon idx, same shape as the old per-row extraction."""
+        attrs = {"area_km2": self._area_values[idx]}
+        for key, values in self.columns.items():
+            attrs[key] = values[idx]
+        attrs.update(self._constants)
+        return attrs
+
+
+class _CellIndex:
+    """
+    Precomputed quadtree cell -> polygon-set table for one layer.
+
+    Cells tile lon/lat space (level z is a 2^z x 2^z grid over the globe). A
+    cell is stored only if it lies entirely inside a fixed set of polygons and
+    touches no other polygon, so any point in it has exactly that answer
+    without a geometry test. Boundary cells are subdivided down to max_level
+    and, if still unresolved, left out — those points fall through to the tree.
+
+    Each stored cell, whatever its level, is a contiguous range of Z-order
+    (Morton) codes at max_level. Stored cells never overlap, so a point is one
+    binary search over the sorted range starts. Polygon ids are kept CSR-style
+    per cell, pre-sorted by area so hits need no further sorting.
+    """
+
+    # Expand cell boxes slightly when classifying so float rounding in the
+    # point -> cell mapping can never put a point just outside its proven box.
+    _EPS = 1e-9
+    _CHUNK = 100_000
+
+    def __init__(self, max_level: int, starts: np.ndarray, ends: np.ndarray,
+                 offsets: np.ndarray, ids: np.ndarray):
+        self.max_level = max_level
+        self.starts = starts
+        self.ends = ends
+        self.offsets = offsets
+        self.ids = ids
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @staticmethod
+    def _spread(v):
+        """Interleave zero bits into v (works on Python ints and int64 arrays)."""
+        v = (v | (v << 16)) & 0x0000FFFF0000FFFF
+        v = (v | (v << 8)) & 0x00FF00FF00FF00FF
+        v = (v | (v << 4)) & 0x0F0F0F0F0F0F0F0F
+        v = (v | (v << 2)) & 0x3333333333333333
+        return (v | (v << 1)) & 0x5555555555555555
+
+    @classmethod
+    def _morton(cls, x, y):
+        return cls._spread(x) | (cls._spread(y) << 1)
+
+    @staticmethod
+    def _cell_coords(level, lons, lats):
+        n = 1 << level
+        x = np.clip(np.floor((lons + 180.0) / 360.0 * n), 0, n - 1).astype("int64")
+        y = np.clip(np.floor((lats + 90.0) / 180.0 * n), 0, n - 1).astype("int64")
+        return x, y
+
+    @classmethod
+    def _boxes(cls, level, xs, ys):
+        w = 360.0 / (1 << level)
+        h = 180.0 / (1 << level)
+        return shapely.box(-180.0 + xs * w - cls._EPS, -90.0 + ys * h - cls._EPS,
+                           -180.0 + (xs + 1) * w + cls._EPS, -90.0 + (ys + 1) * h + cls._EPS)
+
+    @classmethod
+    def build(cls, layer: "_Layer", min_level: int = 6, max_level: int = 13) -> "_CellIndex":
+        """Classify cells level by level, subdividing only the boundary cells."""
+        if not 0 <= min_level <= max_level <= 29:
+            raise ValueError(f"Invalid cell levels: {min_level}..{max_level}")
+        minx, miny, maxx, maxy = shapely.total_bounds(layer.geometries)
+        (x0, x1), (y0, y1) = cls._cell_coords(min_level, np.array([minx, maxx]), np.array([miny, maxy]))
+        xs, ys = np.meshgrid(np.arange(x0, x1 + 1), np.arange(y0, y1 + 1))
+        xs, ys = xs.ravel(), ys.ravel()
+
+        out_starts, out_ends, out_counts, out_ids = [], [], [], []
+        level = min_level
+        while len(xs):
+            shift = 2 * (max_level - level)
+            unresolved = []
+            for start in range(0, len(xs), cls._CHUNK):
+                cx, cy = xs[start:start + cls._CHUNK], ys[start:start + cls._CHUNK]
+                resolved, counts, ids = cls._classify(layer, cls._boxes(level, cx, cy))
+                z = cls._morton(cx[resolved], cy[resolved])
+                out_starts.append(z << shift)
+                out_ends.append((z + 1) << shift)
+                out_counts.append(counts[resolved])
+                out_ids.append(ids)
+                unresolved.append((cx[~resolved], cy[~resolved]))
+            if level == max_level:
+                break
+            # Split every unresolved cell into its four children
+            ux = np.concatenate([u[0] for u in unresolved])
+            uy = np.concatenate([u[1] for u in unresolved])
+            xs = (np.repeat(ux * 2, 4) + np.tile([0, 1, 0, 1], len(ux))).astype("int64")
+            ys = (np.repeat(uy * 2, 4) + np.tile([0, 0, 1, 1], len(uy))).astype("int64")
+            level += 1
+
+        starts = np.concatenate(out_starts)
+        ends = np.concatenate(out_ends)
+        counts = np.concatenate(out_counts)
+        ids = np.concatenate(out_ids).astype("int32")
+
+        # Reorder the CSR groups by range start so lookups can binary-search
+        order = np.argsort(starts, kind="stable")
+        first = np.concatenate([[0], np.cumsum(counts)[:-1]])[order]
+        counts = counts[order]
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype("int64")
+        gather = np.repeat(first - offsets[:-1], counts) + np.arange(offsets[-1])
+        return cls(max_level, starts[order], ends[order], offsets, ids[gather])
+
+    @staticmethod
+    def _classify(layer: "_Layer", boxes):
+        """
+        Returns (resolved mask, polygon count per cell, concatenated area-sorted
+        polygon ids of the resolved cells in cell order).
+        """
+        cell_idx, piece_idx = layer.tree.query(boxes)
+        # Test each (cell, polygon) pair once, against the whole polygon
+        pairs = np.unique(np.stack([cell_idx, layer.piece_parent[piece_idx]], axis=1), axis=0)
+        cell_idx, poly_idx = pairs[:, 0], pairs[:, 1]
+        geoms = layer.geometries[poly_idx]
+        inside = shapely.contains_properly(geoms, boxes[cell_idx])
+        crossing = ~inside
+        crossing[crossing] = shapely.intersects(geoms[crossing], boxes[cell_idx[crossing]])
+
+        resolved = np.ones(len(boxes), dtype=bool)
+        resolved[cell_idx[crossing]] = False
+
+        keep = inside & resolved[cell_idx]
+        cells, polys = cell_idx[keep], poly_idx[keep]
+        order = np.lexsort((polys, layer.area[polys], cells))
+        counts = np.bincount(cells, minlength=len(boxes))
+        return resolved, counts, polys[order]
+
+    def lookup(self, lon: float, lat: float) -> Optional[list]:
+        """Area-sorted polygon ids for the point, or None if it is not in a proven cell."""
+        if not (-180.0 <= lon <= 180.0 and -90.0 <= lat <= 90.0):
+            return None
+        # Scalar twin of _cell_coords at max_level
+        n = 1 << self.max_level
+        x = min(int((lon + 180.0) / 360.0 * n), n - 1)
+        y = min(int((lat + 90.0) / 180.0 * n), n - 1)
+        z = self._morton(x, y)
+        pos = int(self.starts.searchsorted(z, side="right")) - 1
+        if pos < 0 or z >= self.ends[pos]:
+            return None
+        return self.ids_at(pos)
+
+    def lookup_many(self, lons: np.ndarray, lats: np.ndarray) -> np.ndarray:
+        """Cell position for each point, -1 where the point needs an exact test."""
+        valid = (np.abs(lons) <= 180.0) & (np.abs(lats) <= 90.0)
+        x, y = self._cell_coords(self.max_level, np.where(valid, lons, 0.0), np.where(valid, lats, 0.0))
+        z = self._morton(x, y)
+        pos = self.starts.searchsorted(z, side="right") - 1
+        hit = valid & (pos >= 0) & (z < self.ends[np.maximum(pos, 0)])
+        return np.where(hit, pos, -1)
+
+    def ids_at(self, pos: int) -> list:
+        return self.ids[self.offsets[pos]:self.offsets[pos + 1]].tolist()
+
+    def save(self, path: Path):
+        with open(path, "wb") as f:
+            np.savez(f, max_level=self.max_level, starts=self.starts, ends=self.ends,
+                     offsets=self.offsets, ids=self.ids)
+
+    @classmethod
+    def load(cls, path: Path) -> "_CellIndex":
+        with np.load(path) as data:
+            return cls(int(data["max_level"]), data["starts"], data["ends"], data["offsets"], data["ids"])
+
+
+class _PartitionedLayer:
+    """
+    A layer split into lon/lat tiles, each loaded on first query.
+
+    A tile is an ordinary _Layer holding every polygon whose bounding box
+    touches it, so a point only needs the tile it falls in and gets the same
+    answer as from the full layer. Tiles are read with a bbox filter from the
+    snapshot or the source file, so the national layer is never held in
+    memory unless every region is actually queried.
+    """
+
+    # Same role as _CellIndex._EPS: tile boxes are padded so float rounding
+    # in the point -> tile mapping can't put a point outside its tile's box.
+    _EPS = 1e-9
+
+    def __init__(self, index: "SpatialIndex", path: Path, label: str,
+                 tile_deg: float, snapshot_file: Optional[Path] = None):
+        self.utility_type = label.lower()
+        self.label = label
+        self.path = path
+        self.tile_deg = tile_deg
+        self.snapshot_file = snapshot_file
+        self.tiles: dict = {}  # (tx, ty) -> _Layer, or None for an empty tile
+        self._index = index
+        self._lock = threading.Lock()
+        self._loaded_rows: set = set()  # content hashes of the source rows in loaded tiles
+        self.records = self._count_records()
+
+    def __len__(self) -> int:
+        """Records in the whole layer, loaded or not (same meaning as len(_Layer))."""
+        return self.records if self.records is not None else self.loaded_records
+
+    @property
+    def loaded_records(self) -> int:
+        """Distinct source records in the loaded tiles (a polygon spanning tiles counts once)."""
+        return len(self._loaded_rows)
+
+    def _count_records(self) -> Optional[int]:
+        """Record count from the snapshot or source file metadata, without reading the rows."""
+        try:
+            if self.snapshot_file is not None:
+                return pq.ParquetFile(self.snapshot_file).metadata.num_rows
+            return int(pyogrio.read_info(self.path, force_feature_count=True)["features"])
+        except Exception as e:
+            logger.warning(f"{self.label}: could not count records ({e}), reporting loaded tiles only")
+            return None
+
+    @staticmethod
+    def _row_hashes(gdf: gpd.GeoDataFrame) -> np.ndarray:
+        """
+        Per-row content hash (attributes + geometry). Row positions are not
+        stable across bbox reads, but a polygon read for two tiles hashes the same.
+        """
+        geometry = gdf.geometry.name
+        frame = pd.DataFrame(gdf.drop(columns=geometry)).assign(_wkb=shapely.to_wkb(gdf.geometry.values))
+        return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+    def tile_key(self, lon: float, lat: float) -> Optional[tuple]:
+        if not (-180.0 <= lon <= 180.0 and -90.0 <= lat <= 90.0):
+            return None
+        return (math.floor((lon + 180.0) / self.tile_deg), math.floor((lat + 90.0) / self.tile_deg))
+
+    def tile_keys(self, lons: np.ndarray, lats: np.ndarray) -> tuple:
+        """(valid mask, tx, ty) for many points."""
+        valid = (np.abs(lons) <= 180.0) & (np.abs(lats) <= 90.0)
+        tx = np.floor((np.where(valid, lons, 0.0) + 180.0) / self.tile_deg).astype("int64")
+        ty = np.floor((np.where(valid, lats, 0.0) + 90.0) / self.tile_deg).astype("int64")
+        return valid, tx, ty
+
+    def keys_for_bounds(self, bounds: tuple) -> list:
+        minx, miny, maxx, maxy = bounds
+        x0, y0 = self.tile_key(max(minx, -180.0), max(miny, -90.0))
+        x1, y1 = self.tile_key(min(maxx, 180.0), min(maxy, 90.0))
+        return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+    def _tile_box(self, key: tuple):
+        tx, ty = key
+        d = self.tile_deg
+        return shapely.box(-180.0 + tx * d - self._EPS, -90.0 + ty * d - self._EPS,
+                           -180.0 + (tx + 1) * d + self._EPS, -90.0 + (ty + 1) * d + self._EPS)
+
+    def tile_layer(self, lon: float, lat: float) -> Optional[_Layer]:
+        """The loaded tile for a point (loading it if needed), or None."""
+        key = self.tile_key(lon, lat)
+        if key is None:
+            return None
+        if key not in self.tiles:
+            self.load_tiles([key])
+        return self.tiles.get(key)
+
+    def load_tiles(self, keys: list):
+        """Load any of the given tiles not loaded yet, with a single read."""
+        with self._lock:
+            missing = [k for k in dict.fromkeys(keys) if k not in self.tiles]
+            if not missing:
+                return
+            t0 = time.time()
+            boxes = np.array([self._tile_box(k) for k in missing])
+            try:
+                gdf = self._read_frame(shapely.total_bounds(boxes))
+            except Exception as e:
+                logger.error(f"{self.label}: failed to load {len(missing)} tile(s): {e}")
+                return
+            tile_idx, row_idx = shapely.STRtree(np.asarray(gdf.geometry.values)).query(boxes)
+            self._loaded_rows.update(self._row_hashes(gdf.iloc[np.unique(row_idx)]).tolist())
+            for i, key in enumerate(missing):
+                rows = row_idx[tile_idx == i]
+                if not len(rows):
+                    self.tiles[key] = None
+                    continue
+                tile_gdf = gdf.iloc[np.sort(rows)]
+                max_vertices = self._index.config.spatial_subdivide_vertices
+                split = _subdivide(np.asarray(tile_gdf.geometry.values), max_vertices, clip=boxes[i])
+                layer = _Layer(tile_gdf, self.utility_type, max_vertices, split)
+                shapely.prepare(layer.pieces)
+                self.tiles[key] = layer
+            logger.info(
+                f"{self.label}: loaded {len(missing)} tile(s), {len(gdf)} records "
+                f"in {time.time() - t0:.1f}s ({len(self.tiles)} tiles, {self.loaded_records} records loaded)"
+            )
+
+    def _read_frame(self, bounds) -> gpd.GeoDataFrame:
+        """Polygons whose bounding box may touch bounds, from snapshot or source."""
+        if self.snapshot_file is not None:
+            try:
+                return gpd.read_parquet(self.snapshot_file, bbox=tuple(bounds))
+            except ValueError as e:
+                # Snapshots built before bbox coverings were written can't filter
+                logger.warning(f"{self.label}: snapshot has no bbox column ({e}) — rebuild with build_spatial_snapshot.py")
+                if not self.path.exists():
+                    gdf = gpd.read_parquet(self.snapshot_file)
+                    return gdf.cx[bounds[0]:bounds[2], bounds[1]:bounds[3]]
+                self.snapshot_file = None
+        # bbox is given in target CRS; densify it so it stays a superset once
+        # read_file reprojects it into the source CRS.
+        area = shapely.segmentize(shapely.box(*bounds), self.tile_deg / 8)
+        mask = gpd.GeoSeries([area], crs=self._index.config.target_crs)
+        return self._index._read_source(self.path, self.label, bbox=mask)
+
 
 class SpatialIndex:
     """Loads shapefiles into memory and provides fast point-in-polygon queries."""
 
     def __init__(self, config: Config):
         self.config = config
-        self._electric: Optional[gpd.GeoDataFrame] = None
-        self._gas: Optional[gpd.GeoDataFrame] = None
-        self._water: Optional[gpd.GeoDataFrame] = None
+        self._electric: Optional[_Layer] = None
+        self._gas: Optional[_Layer] = None
+        self._water: Optional[_Layer] = None
+        self.cache = SpatialCellCache(config.spatial_cache_size, config.spatial_cache_precision)
 
     def load_all(self):
         """Load all shapefiles. Call once at startup."""
@@ -33,12 +530,57 @@ class SpatialIndex:
         logger.info(f"All spatial layers loaded in {elapsed:.1f}s")
 
     def _load_layer(self, path, label):
-        """Generic layer loader with geometry validation and reprojection."""
-        if not path.exists():
+        """Generic layer loader: prebuilt snapshot if fresh, else the source file."""
+        if self.config.spatial_partition_deg > 0:
+            return self._load_partitioned(path, label)
+        t0 = time.time()
+        cells = split = None
+        snapshot = self._read_snapshot(path, label)
+        if snapshot is not None:
+            gdf, cells, split = snapshot
+        else:
+            if not path.exists():
+                logger.warning(f"{label} file not found: {path}")
+                return None
+            gdf = self._read_source(path, label)
+        layer = _Layer(gdf, label.lower(), self.config.spatial_subdivide_vertices, split)
+        # Cell ids index snapshot rows, so the table only applies with its own snapshot
+        layer.cells = cells
+        # Prepare once so contains() is no longer linear in vertex count. Every
+        # load path (source or snapshot) ends here, so layers are always prepared.
+        shapely.prepare(layer.pieces)
+        elapsed = time.time() - t0
+        logger.info(f"{label}: {len(layer)} records loaded in {elapsed:.1f}s")
+        return layer
+
+    def _load_partitioned(self, path, label) -> Optional[_PartitionedLayer]:
+        """Set up a lazily tiled layer and load the tiles of the preload states."""
+        t0 = time.time()
+        entry = self._snapshot_entry(path, label)
+        snapshot_file = self.config.spatial_snapshot_dir / entry["file"] if entry else None
+        if snapshot_file is None and not path.exists():
             logger.warning(f"{label} file not found: {path}")
             return None
-        t0 = time.time()
-        gdf = gpd.read_file(path)
+        layer = _PartitionedLayer(self, path, label, self.config.spatial_partition_deg, snapshot_file)
+        keys = []
+        for state in self.config.spatial_preload_states:
+            bounds = _STATE_BOUNDS.get(state.upper())
+            if bounds is None:
+                logger.warning(f"{label}: unknown preload state {state!r}, skipping")
+                continue
+            keys += layer.keys_for_bounds(bounds)
+        if keys:
+            layer.load_tiles(keys)
+        logger.info(
+            f"{label}: partitioned into {layer.tile_deg}° tiles from "
+            f"{snapshot_file.name if snapshot_file else path.name} ({len(layer)} records), "
+            f"{len(layer.tiles)} tiles ({layer.loaded_records} records) preloaded in {time.time() - t0:.1f}s"
+        )
+        return layer
+
+    def _read_source(self, path, label, bbox=None) -> gpd.GeoDataFrame:
+        """Read a raw shapefile/gpkg with geometry validation and reprojection."""
+        gdf = gpd.read_file(path, bbox=bbox)
         # Fix invalid geometries
         invalid = ~gdf.geometry.is_valid
         if invalid.any():
@@ -50,11 +592,176 @@ class SpatialIndex:
         # Pre-compute area in km²
         gdf_area = gdf.to_crs(epsg=3083)
         gdf["_area_km2"] = gdf_area.geometry.area / 1e6
-        _ = gdf.sindex
-        elapsed = time.time() - t0
-        logger.info(f"{label}: {len(gdf)} records loaded in {elapsed:.1f}s")
         return gdf
 
+    # ------------------------------------------------------------------
+    # Prebuilt snapshot (see build_spatial_snapshot.py)
+    # ------------------------------------------------------------------
+
+    _SNAPSHOT_VERSION = 1
+    _SNAPSHOT_MANIFEST = "manifest.json"
+
+    def _layer_sources(self) -> dict:
+        return {
+            "Electric": self.config.electric_shp,
+            "Gas": self.config.gas_shp,
+            "Water": self.config.water_gpkg,
+        }
+
+    @staticmethod
+    def _source_signature(path: Path) -> dict:
+        """Size + mtime over the source file and, for shapefiles, its sidecars."""
+        files = [path]
+        if path.suffix.lower() == ".shp":
+            files += [path.with_suffix(ext) for ext in (".dbf", ".shx", ".prj", ".cpg")
+                      if path.with_suffix(ext).exists()]
+        return {
+            "size": sum(f.stat().st_size for f in files),
+            "mtime": max((f.stat().st_mtime for f in files), default=0.0),
+        }
+
+    def _read_manifest(self) -> Optional[dict]:
+        manifest_path = self.config.spatial_snapshot_dir / self._SNAPSHOT_MANIFEST
+        if not manifest_path.exists():
+            return None
+        try:
+            manifest = json.loads(manifest_path.read_text())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable spatial snapshot manifest {manifest_path}: {e}")
+            return None
+        if manifest.get("version") != self._SNAPSHOT_VERSION:
+            logger.warning("Spatial snapshot format is outdated — rebuild with build_spatial_snapshot.py")
+            return None
+        if manifest.get("target_crs") != self.config.target_crs:
+            logger.warning(f"Spatial snapshot CRS {manifest.get('target_crs')} != {self.config.target_crs}, ignoring")
+            return None
+        return manifest
+
+    def _snapshot_entry(self, path, label) -> Optional[dict]:
+        """Manifest entry for the layer if its snapshot exists and is fresh."""
+        manifest = self._read_manifest()
+        entry = (manifest or {}).get("layers", {}).get(label.lower())
+        if not entry:
+            return None
+        if not (self.config.spatial_snapshot_dir / entry["file"]).exists():
+            return None
+        # The snapshot may ship without the source files; only compare when both exist
+        if path.exists() and self._source_signature(path) != entry["source"]:
+            logger.warning(f"{label}: spatial snapshot is stale (source changed), loading from {path}")
+            return None
+        return entry
+
+    def _read_snapshot(self, path, label) -> Optional[tuple]:
+        """
+        Load (gdf, cell index or None, split pieces or None) from the snapshot,
+        or None if missing or stale. Split pieces are only used when they were
+        cut with the configured spatial_subdivide_vertices.
+        """
+        entry = self._snapshot_entry(path, label)
+        if entry is None:
+            return None
+        snap_file = self.config.spatial_snapshot_dir / entry["file"]
+        gdf = gpd.read_parquet(snap_file)
+        cells = None
+        cells_file = self.config.spatial_snapshot_dir / entry["cells"] if entry.get("cells") else None
+        if cells_file is not None and cells_file.exists():
+            cells = _CellIndex.load(cells_file)
+        split = None
+        if entry.get("subdivide_vertices") == self.config.spatial_subdivide_vertices:
+            if entry.get("pieces"):
+                pieces = gpd.read_parquet(self.config.spatial_snapshot_dir / entry["pieces"])
+                split = (np.asarray(pieces.geometry.values), pieces["parent"].to_numpy(dtype="int64"))
+            else:
+                split = (np.empty(0, dtype=object), np.empty(0, dtype="int64"))
+        logger.info(
+            f"{label}: using spatial snapshot {snap_file.name} (built {entry.get('built_at', '?')}"
+            f"{f', {len(cells)} cells' if cells is not None else ''}"
+            f"{f', {len(split[0])} split pieces' if split is not None else ''})"
+        )
+        return gdf, cells, split
+
+    def build_snapshot(self, out_dir: Optional[Path] = None, labels: Optional[list] = None,
+                       cell_levels: Optional[tuple] = (6, 13)) -> dict:
+        """
+        Write pre-validated, pre-projected GeoParquet layers with _area_km2
+        already computed, so later startups skip read_file/make_valid/to_crs.
+        Also builds each layer's cell lookup table (see _CellIndex) and the
+        pieces of polygons above config.spatial_subdivide_vertices (see _Layer).
+
+        Args:
+            out_dir: Snapshot directory (defaults to config.spatial_snapshot_dir)
+            labels: Layers to (re)build, e.g. ["Electric"]. Defaults to all.
+            cell_levels: (min_level, max_level) for the cell table, None to skip it.
+
+        Returns:
+            The written manifest.
+        """
+        out_dir = Path(out_dir or self.config.spatial_snapshot_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path = out_dir / self._SNAPSHOT_MANIFEST
+
+        manifest = {"version": self._SNAPSHOT_VERSION, "target_crs": self.config.target_crs, "layers": {}}
+        if manifest_path.exists():
+            try:
+                previous = json.loads(manifest_path.read_text())
+                if previous.get("version") == self._SNAPSHOT_VERSION:
+                    manifest["layers"] = previous.get("layers", {})
+            except (OSError, ValueError):
+                pass
+
+        for label, path in self._layer_sources().items():
+            if labels and label not in labels:
+                continue
+            if not path.exists():
+                logger.warning(f"{label} file not found: {path} — not in snapshot")
+                continue
+            t0 = time.time()
+            gdf = self._read_source(path, label)
+            name = f"{label.lower()}.parquet"
+            tmp = out_dir / f"{name}.tmp"
+            # bbox covering column lets partitioned loading read single tiles
+            gdf.to_parquet(tmp, write_covering_bbox=True)
+            os.replace(tmp, out_dir / name)
+
+            t1 = time.time()
+            layer = _Layer(gdf, label.lower(), self.config.spatial_subdivide_vertices)
+            pieces_name = None
+            if layer.piece_cut.any():
+                pieces_name = f"{label.lower()}.pieces.parquet"
+                cut = layer.piece_cut
+                pieces = gpd.GeoDataFrame({"parent": layer.piece_parent[cut]},
+                                          geometry=layer.pieces[cut], crs=gdf.crs)
+                pieces.to_parquet(out_dir / f"{pieces_name}.tmp")
+                os.replace(out_dir / f"{pieces_name}.tmp", out_dir / pieces_name)
+                logger.info(f"{label}: split {len(np.unique(pieces['parent']))} large polygons "
+                            f"into {len(pieces)} pieces in {time.time() - t1:.1f}s")
+
+            cells_name = None
+            if cell_levels:
+                t1 = time.time()
+                shapely.prepare(layer.geometries)
+                shapely.prepare(layer.pieces)
+                cells = _CellIndex.build(layer, *cell_levels)
+                cells_name = f"{label.lower()}.cells.npz"
+                cells.save(out_dir / cells_name)
+                logger.info(f"{label}: {len(cells)} resolved cells (levels {cell_levels}) in {time.time() - t1:.1f}s")
+
+            manifest["layers"][label.lower()] = {
+                "file": name,
+                "cells": cells_name,
+                "pieces": pieces_name,
+                "subdivide_vertices": self.config.spatial_subdivide_vertices,
+                "records": len(gdf),
+                "source": self._source_signature(path),
+                "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+            logger.info(f"{label}: wrote {len(gdf)} records to {name} in {time.time() - t0:.1f}s")
+
+        tmp = manifest_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(manifest, indent=2))
+        os.replace(tmp, manifest_path)
+        return manifest
+
     def _load_electric(self):
         self._electric = self._load_layer(self.config.electric_shp, "Electric")
 
@@ -81,34 +788,199 @@ class SpatialIndex:
         Returns:
             List of dicts with polygon attributes, sorted smallest-first.
         """
-        gdf = self._get_layer(utility_type)
-        if gdf is None:
-            return []
+        return self._query_layer_point(self._get_layer(utility_type), lat, lon)
+
+    def query_point_all(self, lat: float, lon: float,
+                        types: tuple = ("electric", "gas", "water")) -> dict:
+        """
+        query_point() for several utility types in one call, sharing a single
+        Point across the layers.
 
+        Returns:
+            {utility_type: list of dicts sorted smallest-first} for each type.
+        """
         point = Point(lon, lat)  # shapely uses (x=lon, y=lat)
+        return {utype: self._query_layer_point(self._get_layer(utype), lat, lon, point) for utype in types}
 
-        # Use spatial index for fast candidate lookup
-        candidates_idx = list(gdf.sindex.intersection(point.bounds))
-        if not candidates_idx:
+    def _query_layer_point(self, layer, lat: float, lon: float, point: Optional[Point] = None) -> list[dict]:
+        """query_point() against one layer; point is built here unless given."""
+        if isinstance(layer, _PartitionedLayer):
+            layer = layer.tile_layer(lon, lat)
+        if layer is None:
             return []
 
+        # Precomputed cell table: interior cells answer without any geometry test
+        if layer.cells is not None:
+            cell_ids = layer.cells.lookup(lon, lat)
+            if cell_ids is not None:
+                return [layer.attributes(idx) for idx in cell_ids]
+
+        # Quantized-coordinate LRU: exact for cells proven uniform on an earlier query
+        cell = self.cache.cell(lat, lon)
+        prove = False
+        if cell is not None:
+            cached, prove = self.cache.lookup(layer.utility_type, cell)
+            if cached is not None:
+                return cached
+
+        if point is None:
+            point = Point(lon, lat)  # shapely uses (x=lon, y=lat)
+
+        # Use spatial index for fast candidate lookup (over the whole cache
+        # cell when proving it, so the same candidates serve both tests)
+        box = shapely.box(*self.cache.bounds(cell)) if prove else None
+        candidates_idx = layer.tree.query(point if box is None else box)
+
         # Filter to actual containment
         results = []
-        for idx in candidates_idx:
-            row = gdf.iloc[idx]
+        matched = set()
+        for piece, idx in zip(candidates_idx.tolist(), layer.piece_parent[candidates_idx].tolist()):
+            if idx in matched:
+                continue
+            geom = layer.pieces[piece]
             try:
-                if row.geometry and row.geometry.contains(point):
-                    attrs = self._extract_attributes(row, utility_type)
-                    results.append(attrs)
+                if geom and (geom.covers(point) if layer.piece_cut[piece] else geom.contains(point)):
+                    matched.add(idx)
+                    results.append(layer.attributes(idx))
             except Exception as e:
                 logger.warning(f"Skipping geometry {idx}: {e}")
                 continue
 
         # Sort by area ascending (smallest polygon = most specific)
         results.sort(key=lambda r: r.get("area_km2", float("inf")))
+        if prove:
+            uniform = self._cell_is_uniform(layer, box, candidates_idx, matched)
+            self.cache.store(layer.utility_type, cell, results if uniform else None)
+        return results
+
+    @staticmethod
+    def _cell_is_uniform(layer: _Layer, box, pieces: np.ndarray, matched: set) -> bool:
+        """True if the cache cell box (with tree candidates pieces) lies inside exactly the polygons in matched."""
+        inside = set()
+        try:
+            for piece, idx in zip(pieces.tolist(), layer.piece_parent[pieces].tolist()):
+                geom = layer.pieces[piece]
+                if idx not in matched:
+                    if geom.intersects(box):
+                        return False
+                elif idx not in inside and geom.contains_properly(box):
+                    inside.add(idx)
+        except shapely.errors.GEOSException:
+            return False
+        return inside == matched
+
+    def query_points(self, lats, lons, utility_type: str) -> list[list[dict]]:
+        """
+        Vectorized query_point() for many coordinates at once.
+
+        Runs one STRtree query over all points and a single vectorized
+        containment test over the resulting (point, polygon) candidate pairs,
+        instead of one Point + one contains() call per candidate. Bulk
+        queries skip the quantized-coordinate LRU used by query_point().
+
+        Args:
+            lats: Sequence or array of latitudes (WGS84)
+            lons: Sequence or array of longitudes (WGS84)
+            utility_type: "electric", "gas", or "water"
+
+        Returns:
+            One list per input point (same order as the input), each sorted
+            smallest-first exactly like query_point().
+        """
+        lats = np.asarray(lats, dtype="float64")
+        lons = np.asarray(lons, dtype="float64")
+        if lats.shape != lons.shape:
+            raise ValueError(f"lats and lons differ in shape: {lats.shape} vs {lons.shape}")
+
+        layer = self._get_layer(utility_type)
+        if layer is None or not len(lats):
+            return [[] for _ in range(len(lats))]
+        if not isinstance(layer, _PartitionedLayer):
+            return self._query_layer_points(layer, lats, lons)
+
+        # Partitioned: load every needed tile at once, then query tile by tile
+        results = [[] for _ in range(len(lats))]
+        valid, tx, ty = layer.tile_keys(lons, lats)
+        points = np.flatnonzero(valid)
+        if not len(points):
+            return results
+        keys, group = np.unique(np.stack([tx[points], ty[points]], axis=1), axis=0, return_inverse=True)
+        keys = [tuple(k) for k in keys.tolist()]
+        layer.load_tiles(keys)
+        order = np.argsort(group.ravel(), kind="stable")
+        splits = np.searchsorted(group.ravel()[order], np.arange(len(keys) + 1))
+        for g, key in enumerate(keys):
+            tile = layer.tiles.get(key)
+            if tile is None:
+                continue
+            members = points[order[splits[g]:splits[g + 1]]]
+            for i, hits in zip(members.tolist(), self._query_layer_points(tile, lats[members], lons[members])):
+                results[i] = hits
+        return results
+
+    def query_points_all(self, lats, lons,
+                         types: tuple = ("electric", "gas", "water")) -> dict:
+        """
+        query_points() for several utility types.
+
+        Returns:
+            {utility_type: one list per input point} for each type.
+        """
+        return {utype: self.query_points(lats, lons, utype) for utype in types}
+
+    def _query_layer_points(self, layer: _Layer, lats: np.ndarray, lons: np.ndarray) -> list[list[dict]]:
+        """query_points() against one loaded layer (or tile)."""
+        results = [[] for _ in range(len(lats))]
+
+        # Precomputed cell table first; only unresolved points go to the tree
+        pending = np.arange(len(lats))
+        if layer.cells is not None:
+            cell_pos = layer.cells.lookup_many(lons, lats)
+            for i in np.flatnonzero(cell_pos >= 0).tolist():
+                results[i] = [layer.attributes(idx) for idx in layer.cells.ids_at(cell_pos[i])]
+            pending = np.flatnonzero(cell_pos < 0)
+            if not len(pending):
+                return results
+
+        points = shapely.points(lons[pending], lats[pending])  # shapely uses (x=lon, y=lat)
+
+        # Bounding-box candidates for every point in one tree query
+        point_idx, piece_idx = layer.tree.query(points)
+        if not len(point_idx):
+            return results
+
+        # Filter to actual containment (covers() on pieces of split polygons)
+        pieces = layer.pieces
+        cut = layer.piece_cut[piece_idx]
+        try:
+            hit = np.empty(len(piece_idx), dtype=bool)
+            hit[~cut] = shapely.contains(pieces[piece_idx[~cut]], points[point_idx[~cut]])
+            hit[cut] = shapely.covers(pieces[piece_idx[cut]], points[point_idx[cut]])
+        except shapely.errors.GEOSException:
+            hit = np.array([self._safe_contains(pieces[j], points[i], j, c)
+                            for i, j, c in zip(point_idx, piece_idx, cut)], dtype=bool)
+        poly_idx = layer.piece_parent[piece_idx[hit]]
+        point_idx = pending[point_idx[hit]]
+        if cut.any():
+            # A point on a cut line is in two pieces of the same polygon
+            pairs = np.unique(np.stack([point_idx, poly_idx], axis=1), axis=0)
+            point_idx, poly_idx = pairs[:, 0], pairs[:, 1]
+
+        # Group by input point, smallest polygon first within each group
+        order = np.lexsort((layer.area[poly_idx], point_idx))
+        for i, j in zip(point_idx[order].tolist(), poly_idx[order].tolist()):
+            results[i].append(layer.attributes(j))
         return results
 
-    def _get_layer(self, utility_type: str) -> Optional[gpd.GeoDataFrame]:
+    @staticmethod
+    def _safe_contains(geom, point, idx, cut=False) -> bool:
+        try:
+            return bool(geom is not None and (geom.covers(point) if cut else geom.contains(point)))
+        except Exception as e:
+            logger.warning(f"Skipping geometry {idx}: {e}")
+            return False
+
+    def _get_layer(self, utility_type: str) -> Optional[_Layer]:
         if utility_type == "electric":
             return self._electric
         elif utility_type == "gas":
@@ -117,45 +989,6 @@ class SpatialIndex:
             return self._water
         return None
 
-    def _extract_attributes(self, row, utility_type: str) -> dict:
-        """Extract relevant attributes from a GeoDataFrame row."""
-        base = {
-            "area_km2": row.get("_area_km2", 0),
-        }
-
-        if utility_type == "electric":
-            base.update({
-                "name": row.get("NAME", ""),
-                "state": row.get("STATE", ""),
-                "type": row.get("TYPE", ""),
-                "holding_co": row.get("HOLDING_CO", ""),
-                "cntrl_area": row.get("CNTRL_AREA", ""),
-                "customers": row.get("CUSTOMERS", 0),
-                "eia_id": row.get("ID", ""),
-                "source": "HIFLD Electric Retail Service Territories",
-            })
-        elif utility_type == "gas":
-            base.update({
-                "name": row.get("NAME", ""),
-                "state": row.get("STATE", ""),
-                "type": row.get("TYPE", ""),
-                "holding_co": row.get("HOLDINGCO", ""),
-                "customers": row.get("TOTAL_CUST", 0),
-                "eia_id": row.get("SVCTERID", ""),
-                "source": "HIFLD Natural Gas Service Territories",
-            })
-        elif utility_type == "water":
-            base.update({
-                "name": row.get("PWS_Name", ""),
-                "state": row.get("Primacy_Agency", ""),
-                "type": "WATER",
-                "pwsid": row.get("PWSID", ""),
-                "population_served": row.get("Population_Served_Count", 0),
-                "source": "EPA CWS Boundaries",
-            })
-
-        return base
-
     @property
     def is_loaded(self) -> bool:
         return self._electric is not None
@@ -167,3 +1000,7 @@ class SpatialIndex:
             "gas": len(self._gas) if self._gas is not None else 0,
             "water": len(self._water) if self._water is not None else 0,
         }
+
+    def reset_after_fork(self):
+        """No-op — layers hold no process-bound handles and are shared copy-on-write."""
+        pass
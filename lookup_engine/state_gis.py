@@ -10,14 +10,18 @@ Usage:
     # Returns: {"name": "Oncor Electric Delivery", "source": "state_gis_TX", "confidence": 0.95, "state": "TX"}
 """
 
+import asyncio
 import json
 import logging
+import threading
 import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Optional
 
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +31,59 @@ _DEFAULT_TIMEOUT = 1
 # Circuit breaker: disable endpoint after this many consecutive failures
 _CIRCUIT_BREAKER_THRESHOLD = 2
 
+# Keep-alive connections held per host (sync session and async client)
+_POOL_SIZE = 20
+
+
+class _AsyncArcGISClient:
+    """
+    httpx.AsyncClient on a dedicated event-loop thread, so synchronous
+    callers (lookup worker threads) can fan out several ArcGIS queries at
+    once. Connections are pooled per host and kept alive between lookups.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="state-gis-async", daemon=True)
+        self._thread.start()
+        self._client = self._call(self._make_client(), timeout=5)
+
+    @staticmethod
+    async def _make_client() -> httpx.AsyncClient:
+        # follow_redirects: requests did, and httpx would otherwise fail on a
+        # moved service URL or http->https redirect and trip the circuit breaker
+        return httpx.AsyncClient(follow_redirects=True,
+                                 limits=httpx.Limits(max_connections=None,
+                                                     max_keepalive_connections=_POOL_SIZE))
+
+    def _call(self, coro, timeout: float):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def get_json_all(self, requests_: list, timeout: float) -> list:
+        """
+        GET each (url, params) concurrently; returns the parsed JSON or the
+        exception for each, in request order.
+        """
+        async def _get(url, params):
+            response = await self._client.get(url, params=params, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+
+        async def _gather():
+            return await asyncio.gather(*(_get(url, params) for url, params in requests_),
+                                        return_exceptions=True)
+
+        # Every request carries its own timeout; the margin only guards the loop itself
+        return self._call(_gather(), timeout * 2 + 5)
+
+    def close(self):
+        try:
+            self._call(self._client.aclose(), timeout=5)
+        except Exception as e:
+            logger.debug(f"State GIS async client close failed: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
 
 class StateGISLookup:
     """Query state-level GIS APIs for utility provider at a point."""
@@ -46,6 +103,12 @@ class StateGISLookup:
         # Simple in-memory cache: {(lat_round, lon_round, state, utility_type): result}
         self._cache: dict = {}
 
+        # HTTP: a keep-alive session for single queries; the async client for
+        # concurrent multi-layer/fallback queries is started on first use
+        self._session = self._make_session()
+        self._async: Optional[_AsyncArcGISClient] = None
+        self._async_lock = threading.Lock()
+
         # Disk cache: persists across runs to avoid re-querying state GIS APIs
         self._disk_cache: dict = {}  # "lat,lon,state,utype" -> result_or_null
         self._disk_cache_dirty = 0
@@ -90,7 +153,7 @@ class StateGISLookup:
             try:
                 # Just hit the endpoint with a simple query to see if it responds
                 test_url = url.split("/query")[0] + "?f=json" if "/query" in url else url + "?f=json"
-                resp = requests.get(test_url, timeout=_DEFAULT_TIMEOUT)
+                resp = self._session.get(test_url, timeout=_DEFAULT_TIMEOUT)
                 return (state, utype, resp.status_code < 500)
             except Exception:
                 return (state, utype, False)
@@ -210,43 +273,31 @@ class StateGISLookup:
             return None
 
         exclude_names = config.get("exclude_names", [])
+        out_fields = config.get("out_fields", "*")
+        primary = dict(url=url, name_field=config["name_field"], out_fields=out_fields,
+                       filter_field=config.get("filter_field"), filter_value=config.get("filter_value"))
 
-        name = self._query_arcgis(
-            url=url,
-            lat=lat,
-            lon=lon,
-            name_field=config["name_field"],
-            out_fields=config.get("out_fields", "*"),
-            filter_field=config.get("filter_field"),
-            filter_value=config.get("filter_value"),
-            timeout=timeout,
-        )
-
-        if name and name not in exclude_names:
-            return {
-                "name": name,
-                "source": f"state_gis_{state.lower()}",
-                "confidence": config.get("confidence", 0.90),
-                "state": state,
-            }
-
-        # Try fallback URL if primary returned nothing (or was excluded)
+        # Fallback URL, used if primary returns nothing (or was excluded).
+        # Both are queried at once so a primary miss costs no extra round trip.
         fallback_url = config.get("fallback_url")
         if fallback_url:
-            fallback_name_field = config.get("fallback_name_field", config["name_field"])
-            name = self._query_arcgis(
-                url=fallback_url,
-                lat=lat,
-                lon=lon,
-                name_field=fallback_name_field,
-                out_fields=config.get("out_fields", "*"),
-                timeout=timeout,
-            )
+            fallback = dict(url=fallback_url, out_fields=out_fields,
+                            name_field=config.get("fallback_name_field", config["name_field"]))
+            names = self._query_arcgis_all([primary, fallback], lat, lon, timeout)
+        else:
+            names = [self._query_arcgis(lat=lat, lon=lon, timeout=timeout, **primary)]
+
+        sources = [
+            (f"state_gis_{state.lower()}", config.get("confidence", 0.90)),
+            (f"state_gis_{state.lower()}_fallback",
+             config.get("fallback_confidence", config.get("confidence", 0.85))),
+        ]
+        for name, (source, confidence) in zip(names, sources):
             if name and name not in exclude_names:
                 return {
                     "name": name,
-                    "source": f"state_gis_{state.lower()}_fallback",
-                    "confidence": config.get("fallback_confidence", config.get("confidence", 0.85)),
+                    "source": source,
+                    "confidence": confidence,
                     "state": state,
                 }
 
@@ -254,25 +305,23 @@ class StateGISLookup:
 
     def _query_multi_layer(self, lat: float, lon: float, state: str,
                            config: dict, timeout: int = _DEFAULT_TIMEOUT) -> Optional[dict]:
-        """Query multiple ArcGIS layers (e.g., IOU + Municipal + Coop)."""
+        """
+        Query multiple ArcGIS layers (e.g., IOU + Municipal + Coop) concurrently;
+        the first layer in config order with a match wins.
+        """
         name_field = config["name_field"]
         out_fields = config.get("out_fields", "*")
 
+        queries = []
         for layer in config["layers"]:
             if isinstance(layer, dict):
                 url = layer["url"]
             else:
                 # Layer ID template: url contains {layer}
                 url = config["url"].replace("{layer}", str(layer))
+            queries.append(dict(url=url, name_field=name_field, out_fields=out_fields))
 
-            name = self._query_arcgis(
-                url=url,
-                lat=lat,
-                lon=lon,
-                name_field=name_field,
-                out_fields=out_fields,
-                timeout=timeout,
-            )
+        for name in self._query_arcgis_all(queries, lat, lon, timeout):
             if name:
                 return {
                     "name": name,
@@ -303,12 +352,23 @@ class StateGISLookup:
                 }
         return None
 
-    def _query_arcgis(self, url: str, lat: float, lon: float,
-                      name_field: str, out_fields: str = "*",
-                      filter_field: str = None, filter_value=None,
-                      timeout: int = _DEFAULT_TIMEOUT) -> Optional[str]:
-        """Execute an ArcGIS REST API point-in-polygon query."""
-        params = {
+    @staticmethod
+    def _make_session() -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=_POOL_SIZE, pool_maxsize=_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _async_client(self) -> _AsyncArcGISClient:
+        with self._async_lock:
+            if self._async is None:
+                self._async = _AsyncArcGISClient()
+            return self._async
+
+    @staticmethod
+    def _arcgis_params(lat: float, lon: float, out_fields: str = "*") -> dict:
+        return {
             "where": "1=1",
             "geometry": f"{lon},{lat}",
             "geometryType": "esriGeometryPoint",
@@ -319,10 +379,37 @@ class StateGISLookup:
             "f": "json",
         }
 
-        response = requests.get(url, params=params, timeout=timeout)
+    def _query_arcgis_all(self, queries: list, lat: float, lon: float,
+                          timeout: int = _DEFAULT_TIMEOUT):
+        """
+        Run several _query_arcgis() queries (dicts of its keyword arguments)
+        concurrently. Yields the names in query order, raising a query's error
+        when its turn comes, so callers that stop at the first match behave
+        exactly like a serial walk.
+        """
+        responses = self._async_client().get_json_all(
+            [(q["url"], self._arcgis_params(lat, lon, q.get("out_fields", "*"))) for q in queries],
+            timeout=timeout,
+        )
+        for query, data in zip(queries, responses):
+            if isinstance(data, BaseException):
+                raise data
+            yield self._feature_name(data, query["name_field"],
+                                     query.get("filter_field"), query.get("filter_value"))
+
+    def _query_arcgis(self, url: str, lat: float, lon: float,
+                      name_field: str, out_fields: str = "*",
+                      filter_field: str = None, filter_value=None,
+                      timeout: int = _DEFAULT_TIMEOUT) -> Optional[str]:
+        """Execute an ArcGIS REST API point-in-polygon query."""
+        response = self._session.get(url, params=self._arcgis_params(lat, lon, out_fields), timeout=timeout)
         response.raise_for_status()
-        data = response.json()
+        return self._feature_name(response.json(), name_field, filter_field, filter_value)
 
+    @staticmethod
+    def _feature_name(data: dict, name_field: str, filter_field: str = None,
+                      filter_value=None) -> Optional[str]:
+        """Name of the first matching feature in an ArcGIS query response."""
         features = data.get("features", [])
         if not features:
             return None
@@ -381,6 +468,20 @@ class StateGISLookup:
         """Clear the in-memory result cache."""
         self._cache.clear()
 
+    def reset_after_fork(self):
+        """Drop HTTP connections and the async loop thread inherited from the parent."""
+        self._session = self._make_session()
+        self._async = None  # its loop thread does not exist in the child
+        self._async_lock = threading.Lock()
+
+    def close(self):
+        """Close HTTP connections and stop the async client's loop thread."""
+        self._session.close()
+        with self._async_lock:
+            client, self._async = self._async, None
+        if client is not None:
+            client.close()
+
     def reset_circuit_breakers(self):
         """Reset all circuit breakers (e.g., for a new batch run)."""
         self._failures.clear()
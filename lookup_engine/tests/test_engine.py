@@ -94,6 +94,17 @@ def main():
     test("AEP Texas North found via geometry",
          lambda: any("AEP" in r["name"].upper() for r in aep_north))
 
+    # Bulk path (cell table + vectorized tree query) agrees with query_point
+    pts = [(41.8781, -87.6298), (29.4241, -98.4936), (32.7767, -96.7970), (27.8006, -97.3964)]
+    bulk = engine.spatial.query_points([p[0] for p in pts], [p[1] for p in pts], "electric")
+    test("query_points matches query_point for each point",
+         lambda: all([r["name"] for r in b] == [r["name"] for r in engine.spatial.query_point(lat, lon, "electric")]
+                     for b, (lat, lon) in zip(bulk, pts)))
+    both = engine.spatial.query_point(41.8781, -87.6298, "gas")
+    test("query_point_all matches per-type query_point",
+         lambda: [r["name"] for r in engine.spatial.query_point_all(41.8781, -87.6298, ("electric", "gas"))["gas"]]
+         == [r["name"] for r in both])
+
     # ============================================================
     print("\n=== Scorer / Normalization Tests ===")
     # ============================================================
@@ -174,9 +185,59 @@ def main():
     cached3 = cache.get("999 Nowhere St, Nowhere, XX 00000")
     test("Cache: miss returns None", lambda: cached3 is None)
 
+    # Write-behind: entries survive close() and are served from disk on reopen
+    cache.put("456 Flush Ave, Chicago, IL 60606", fake_result)
+    cache.close()
+    cache = LookupCache(tmp_db, ttl_days=1, memory_size=0)
+    test("Cache: write-behind flushed on close", lambda: cache.get("456 Flush Ave, Chicago, IL 60606") is not None)
+
+    # A process that exits without close() still flushes (atexit)
+    import subprocess
+    subprocess.run([sys.executable, "-c",
+                    "import sys; from pathlib import Path; from lookup_engine.cache import LookupCache; "
+                    "from lookup_engine.models import LookupResult; "
+                    "LookupCache(Path(sys.argv[1]), ttl_days=1).put('789 Exit Blvd, Chicago, IL 60606', "
+                    "LookupResult(address='789 Exit Blvd, Chicago, IL 60606', lat=41.87, lon=-87.63))",
+                    str(tmp_db)], check=True, cwd=Path(__file__).resolve().parents[2])
+    test("Cache: write-behind flushed at exit without close",
+         lambda: cache.get("789 Exit Blvd, Chicago, IL 60606") is not None)
+    cache.invalidate("789 Exit Blvd, Chicago, IL 60606")
+
     cache.invalidate("123 Test St, Chicago, IL 60606")
+    cache.invalidate("456 Flush Ave, Chicago, IL 60606")
     test("Cache: invalidate works", lambda: cache.size == 0)
 
+    # Location-level key: same geocode, different spelling
+    loc_key = cache.location_key(41.87, -87.63, "IL", "60606", "Chicago", "Cook")
+    cache.put_location(loc_key, fake_result)
+    test("Cache: location key hit", lambda: cache.get_location(
+        cache.location_key(41.87, -87.63, "IL", "60606", "chicago", "COOK")) is not None)
+
+    # Size cap: maintenance keeps the most recently read entry
+    cache.put("789 Evict Rd, Chicago, IL 60606", fake_result)
+    cache.get_location(loc_key)
+    cache.max_entries = 1
+    cache.maintain()
+    test("Cache: LRU eviction honours max_entries", lambda: cache.size == 1
+         and cache.get_location(loc_key) is not None)
+
+    # Tag invalidation removes only the entries that depended on the tag
+    cache.put("1 Tagged St, Dallas, TX 75201", fake_result, ["electric:state_gis_tx", "zip:75201"])
+    cache.put("2 Tagged St, Dallas, TX 75202", fake_result, ["zip:75202"])
+    test("Cache: invalidate_tag removes tagged entries only",
+         lambda: cache.invalidate_tag("electric:state_gis_tx") == 1
+         and cache.get("1 Tagged St, Dallas, TX 75201") is None
+         and cache.get("2 Tagged St, Dallas, TX 75202") is not None)
+
+    # Warm start: hot keys saved at shutdown are loaded into the memory tier
+    tmp_snapshot = tmp_db.with_suffix(".hot.json")
+    cache.save_snapshot(tmp_snapshot, 10)
+    cache.close()
+    cache = LookupCache(tmp_db, ttl_days=1)
+    test("Cache: hot-key snapshot warms memory tier",
+         lambda: cache.load_snapshot(tmp_snapshot) == 2 and len(cache.memory) == 2)
+    os.unlink(tmp_snapshot)
+
     cache.close()
     os.unlink(tmp_db)
 